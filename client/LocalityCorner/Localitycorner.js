@@ -2,6 +2,7 @@ const API_BASE = "/api";
 let masterLocalities = [];
 let currentPage = 1;
 let totalPages = 1;
+let pageCursors = [null]; // pageCursors[n] = after_id that loads page n + 1
 let editingRowId = null; // Track which row is being edited
 let currentPendingItem = null;
 let bulkSelection = new Set();
@@ -46,13 +47,17 @@ function populateDropdown(id, data) {
 // --- VIEW TAB ---
 async function fetchTableData(page) {
     const search = document.getElementById('viewSearch').value;
+    if (page === 1) pageCursors = [null];
+    const cursor = pageCursors[page - 1];
+    const query = cursor ? `after_id=${cursor}` : `page=${page}`;
     try {
-        const res = await fetch(`${API_BASE}/localities/?page=${page}&search=${search}`);
+        const res = await fetch(`${API_BASE}/localities/?${query}&search=${search}`);
         const data = await res.json();
         renderTable(data.results || []);
 
         currentPage = page;
         totalPages = data.pagination ? data.pagination.total_pages : 1;
+        if (data.pagination) pageCursors[page] = data.pagination.next_after_id;
         document.getElementById('pageIndicator').innerText = `Page ${page} of ${totalPages}`;
         document.getElementById('globalPendingCount').innerText = data.global_pending || 0;
 
@@ -1,23 +1,40 @@
 from sqladmin import Admin, ModelView
 from sqladmin.authentication import AuthenticationBackend
 from fastapi import Request
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 
 # Internal Imports
 from .database import engine
 from .models import User, TripData, ClientData, RawTripData, OperationData, T3AddressLocality
-from .auth import verify_password, get_password_hash
+from .auth import verify_password, get_password_hash, get_user_password_hash, clear_user_hash_cache
 
 # --- 1. AUTHENTICATION BACKEND ---
+ALLOWED_USERS: frozenset[str] = frozenset({"admin", "chickenman"})
+
+def check_credentials(username, password) -> bool:
+    with Session(engine) as session:
+        password_hash = get_user_password_hash(session, username)
+    return bool(password_hash) and verify_password(password, password_hash)
+
 class AdminAuth(AuthenticationBackend):
+    def __init__(self, secret_key: str) -> None:
+        super().__init__(secret_key)
+        # main.py's SessionMiddleware already verifies and signs the session cookie
+        # for every route including /admin; sqladmin's own copy would do it twice
+        # (and re-set the cookie without https_only/max_age)
+        self.middlewares = []
+
     async def login(self, request: Request) -> bool:
         form = await request.form()
         username, password = form.get("username"), form.get("password")
-        with Session(engine) as session:
-            user = session.exec(select(User).where(User.username == username)).first()
-            if user and verify_password(password, user.password_hash):
-                request.session.update({"user": user.username})
-                return True
+        # Only these accounts can pass authenticate(), so skip the lookup and bcrypt for anyone else
+        if username not in ALLOWED_USERS:
+            return False
+        # DB lookup + bcrypt run in the threadpool so they don't block the event loop
+        if await run_in_threadpool(check_credentials, username, password):
+            request.session.update({"user": username})
+            return True
         return False
 
     async def logout(self, request: Request) -> bool:
@@ -25,7 +42,7 @@ class AdminAuth(AuthenticationBackend):
         return True
 
     async def authenticate(self, request: Request) -> bool:
-        return request.session.get("user") in ["admin", "chickenman"]
+        return request.session.get("user") in ALLOWED_USERS
 
 # --- 2. ADMIN VIEWS ---
 class UserAdmin(ModelView, model=User):
@@ -36,6 +53,10 @@ class UserAdmin(ModelView, model=User):
             hashed = get_password_hash(password)
             model.password_hash = hashed
             data["password_hash"] = hashed
+        clear_user_hash_cache()
+
+    async def after_model_delete(self, model, request):
+        clear_user_hash_cache()
 
 class TripDataAdmin(ModelView, model=TripData): 
     column_list = [TripData.shift_date, TripData.unique_id, TripData.employee_name]
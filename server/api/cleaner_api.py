@@ -1,12 +1,15 @@
 import os
 import io
+import logging
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import text
 import pandas as pd
 from pathlib import Path
 from contextlib import asynccontextmanager
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, Request, Form, Response, UploadFile, File, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, Form, Response, UploadFile, File, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse, FileResponse, JSONResponse, StreamingResponse
@@ -22,11 +25,11 @@ from sqladmin.authentication import AuthenticationBackend
 # --- INTERNAL IMPORTS ---
 from ..auth import verify_password, get_password_hash
 from ..database import create_db_and_tables, get_session, engine
-from ..models import User, ClientData, RawTripData, OperationData, TripData, T3AddressLocality, T3LocalityZone, T3ZoneKm, BARowData
+from ..models import User, ClientData, RawTripData, OperationData, TripData, T3AddressLocality, T3LocalityZone, T3ZoneKm, BARowData, CleanDataResult
 from ..cleaner.mis_data_cleaner import process_client_data, process_raw_data,process_ba_row_data
 from ..cleaner.fastag_data_cleaner import process_fastag_data
 from ..cleaner.cleaner_helper import create_styled_excel
-from ..cleaner.cleaner_helper import bulk_save_unique
+from ..cleaner.cleaner_helper import bulk_save_unique, sync_addresses_to_t3
 from ..cleaner.operation_data_cleaner import process_operation_app_data
 
 # 1. Setup paths relative to THIS file
@@ -35,8 +38,33 @@ CLIENT_DIR = BASE_DIR / "client"
 # Define the generated folder path here
 GENERATED_DIR = CLIENT_DIR / "DataCleaner" / "generated"
 
-templates = Jinja2Templates(directory=str(CLIENT_DIR / "DataCleaner"))
+# Shared Jinja environment and redirects (see utils/global_helpers.py)
+from ..utils.global_helpers import templates, redirect_to_login
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+# Shared writer threads so saving a workbook can overlap the request's DB work
+file_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="generated-writer")
+
+
+def save_generated_file(excel_output, filename):
+    """Write a cleaner's workbook to GENERATED_DIR without building another full-size copy."""
+    os.makedirs(GENERATED_DIR, exist_ok=True)
+    with open(GENERATED_DIR / filename, "wb") as f:
+        if isinstance(excel_output, io.BytesIO):
+            # Write straight from BytesIO's own buffer: no read() copy, no chunk copies
+            with excel_output.getbuffer() as view:
+                f.write(view)
+        else:
+            excel_output.seek(0)
+            shutil.copyfileobj(excel_output, f, 1 << 20)
+
+
+def sync_addresses_in_background(df_result):
+    """Runs after the response is sent, so it opens its own session (the request's is closed by then)."""
+    with Session(engine) as session:
+        sync_addresses_to_t3(session, df_result)
 
 
 # ==========================================
@@ -44,118 +72,96 @@ router = APIRouter()
 # ==========================================
 @router.get("/cleaner")
 async def cleaner_page(request: Request):
-    if not request.session.get("user"): return RedirectResponse(url="/login", status_code=303)
+    if not request.session.get("user"): return redirect_to_login()
     return templates.TemplateResponse(
     "Datacleaner.html", 
     {"request": request, "user": request.session.get("user")}
 )
 
 
-@router.post("/clean-data")
-async def clean_data(
+# Plain def: pandas work and DB writes run in the threadpool, not on the event loop
+@router.post("/clean-data", response_model=CleanDataResult, response_model_exclude_unset=True)
+def clean_data(
+    request: Request,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     cleanerType: str = Form(...),
     session: Session = Depends(get_session)
 ):
     try:
-        print(f"🚀 Processing {len(files)} files with mode: {cleanerType}")
+        logger.info("🚀 Processing %d files with mode: %s", len(files), cleanerType)
         df_result = None
         excel_output = None
+        # Process pool owned by the app lifespan (main.py), shared by all requests
+        cleaner_pool = getattr(request.app.state, "cleaner_pool", None)
         filename = "output.xlsx"
         rows_saved = 0
-        new_addresses = 0
 
 
         # ==========================================
         # A. CLIENT DATA
         # ==========================================
         if cleanerType == "client":
-            content = await files[0].read()
-            df_result, excel_output, filename = process_client_data(content)
+            df_result, excel_output, filename = process_client_data(files[0].file)
             
-            # 1. Database Logic
-            rows_saved = bulk_save_unique(session, ClientData, df_result)
-            if df_result is not None:
-                new_addresses = sync_addresses_to_t3(session, df_result)
-            
-            # 2. Sync Unique IDs (Custom Logic)
-            if df_result is not None and not df_result.empty and "unique_id" in df_result.columns:
-                incoming_ids = df_result["unique_id"].dropna().unique().tolist()
-                existing_ids = set(session.exec(select(ClientData.unique_id).where(col(ClientData.unique_id).in_(incoming_ids))).all())
-                new_rows = df_result[~df_result["unique_id"].isin(existing_ids)]
-                if not new_rows.empty:
-                    records = [ClientData(**row.to_dict()) for _, row in new_rows.iterrows()]
-                    session.add_all(records)
-                    session.commit()
-
-            # 3. Save & Return (FIXED: Added this block)
             if excel_output is None:
                 return Response("Error processing Client data", status_code=400)
-            
-            generated_dir = GENERATED_DIR
-            os.makedirs(generated_dir, exist_ok=True)
-            save_path = generated_dir / filename
-            with open(save_path, "wb") as f:
-                f.write(excel_output.read())
+
+            # 1. Workbook goes to disk on a writer thread while this thread saves the rows;
+            #    new addresses are synced to T3 after the response is sent
+            saved = file_writer.submit(save_generated_file, excel_output, filename)
+            rows_saved = bulk_save_unique(session, ClientData, df_result)
+            if df_result is not None:
+                background_tasks.add_task(sync_addresses_in_background, df_result)
+
+            # 2. Return once the file is on disk
+            saved.result()
 
             return {
                 "status": "success", 
                 "file_url": filename, 
                 "rows_processed": len(df_result) if df_result is not None else 0, 
-                "db_rows_added": rows_saved, 
-                "new_addresses_added": new_addresses
+                "db_rows_added": rows_saved
             }
 
         # ==========================================
         # B. RAW DATA
         # ==========================================
         elif cleanerType == "raw":
-            file_data = []
-            for f in files:
-                content = await f.read()
-                file_data.append((f.filename, content))
+            # Uploads are already spooled temp files; pandas reads them directly
+            file_data = [(f.filename, f.file) for f in files]
             
-            df_result, excel_output, filename = process_raw_data(file_data)
+            df_result, excel_output, filename = process_raw_data(file_data, pool=cleaner_pool)
             
-            # 1. Database Logic
+            if excel_output is None:
+                return Response("Error processing Raw data", status_code=400)
+
+            # 1. Workbook goes to disk on a writer thread while this thread does the DB work
+            saved = file_writer.submit(save_generated_file, excel_output, filename)
             rows_saved = bulk_save_unique(session, RawTripData, df_result)
             if df_result is not None:
-                new_addresses = sync_addresses_to_t3(session, df_result)
+                background_tasks.add_task(sync_addresses_in_background, df_result)
 
-            # 2. Save & Return (FIXED: Added this block)
-            if excel_output is None:
-                return Response("Error processing Raw data", status_code=400)
-            
-            generated_dir = GENERATED_DIR
-            os.makedirs(generated_dir, exist_ok=True)
-            save_path = generated_dir / filename
-            with open(save_path, "wb") as f:
-                f.write(excel_output.read())
+            # 2. Return once the file is on disk
+            saved.result()
 
             return {
                 "status": "success", 
                 "file_url": filename, 
                 "rows_processed": len(df_result) if df_result is not None else 0, 
-                "db_rows_added": rows_saved, 
-                "new_addresses_added": new_addresses
+                "db_rows_added": rows_saved
             }
         # --- C. OPERATION ---            
 
         elif cleanerType == "operation":
-            file_data = []
-            for f in files:
-                content = await f.read()
-                file_data.append((f.filename, content))
-            df_result, excel_output, filename = process_operation_app_data(file_data)
+            # Only .xls sheets are parsed; the spooled uploads are passed as-is
+            file_data = [(f.filename, f.file) for f in files if (f.filename or "").lower().endswith('.xls')]
+            df_result, excel_output, filename = process_operation_app_data(file_data, pool=cleaner_pool)
 
             if excel_output is None:
                 return Response("Error processing data", status_code=400)
 
-            generated_dir = GENERATED_DIR
-            os.makedirs(generated_dir, exist_ok=True)
-            save_path = generated_dir / filename
-            with open(save_path, "wb") as f:
-                f.write(excel_output.read())
+            save_generated_file(excel_output, filename)
 
             row_count = len(df_result) if df_result is not None else "Formatting Only"
             return {
@@ -167,8 +173,7 @@ async def clean_data(
 
         # --- D. BA ROW DATA (CSV) ---
         elif cleanerType == "ba_row":
-            content = await files[0].read()
-            df_result, excel_output, filename = process_ba_row_data(content)
+            df_result, excel_output, filename = process_ba_row_data(files[0].file)
             
             # ... (Existing Database Logic) ...
 
@@ -177,12 +182,7 @@ async def clean_data(
                 return Response("Error processing BA data", status_code=400)
 
             # 1. Save the generated file to disk so the frontend can download it
-            generated_dir = GENERATED_DIR
-            os.makedirs(generated_dir, exist_ok=True)
-            save_path = generated_dir / filename
-            
-            with open(save_path, "wb") as f:
-                f.write(excel_output.read())
+            save_generated_file(excel_output, filename)
 
             # 2. Return the JSON response the frontend is waiting for
             row_count = len(df_result) if df_result is not None else 0
@@ -195,11 +195,8 @@ async def clean_data(
 
         # --- E. FASTAG DATA (PDF) ---
         elif cleanerType == "fastag":
-            # 1. Collect files as (filename, content) tuples
-            file_data = []
-            for f in files:
-                content = await f.read()
-                file_data.append((f.filename, content))  # <--- Pass filename here!
+            # 1. Collect files as (filename, spooled upload) tuples
+            file_data = [(f.filename, f.file) for f in files]  # <--- Pass filename here!
             
             # 2. Pass to function
             df_result, excel_output, filename = process_fastag_data(file_data)
@@ -209,12 +206,7 @@ async def clean_data(
                 return Response("Error processing Fastag PDF", status_code=400)
 
             # 4. Save to Disk
-            generated_dir = GENERATED_DIR
-            os.makedirs(generated_dir, exist_ok=True)
-            save_path = generated_dir / filename
-            
-            with open(save_path, "wb") as f:
-                f.write(excel_output.read())
+            save_generated_file(excel_output, filename)
 
             # 5. Return Response
             row_count = len(df_result) if df_result is not None else 0
@@ -226,6 +218,6 @@ async def clean_data(
             }
 
     except Exception as e:
-        print(f"❌ Server Error: {e}")
+        logger.error("❌ Server Error: %s", e)
         return Response(f"Internal Error: {e}", status_code=500)
         
\ No newline at end of file
@@ -1,7 +1,11 @@
 import os
 import io
+import logging
+import tempfile
+from stat import S_ISREG
 from sqlalchemy import text
 import pandas as pd
+import xlsxwriter
 from pathlib import Path
 from contextlib import asynccontextmanager
 from typing import List, Optional
@@ -30,33 +34,64 @@ from ..cleaner.fastag_data_cleaner import process_fastag_data
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CLIENT_DIR = BASE_DIR / "client"
 GENERATED_DIR = BASE_DIR / "client" / "DataCleaner" / "generated"
+GENERATED_ROOT = GENERATED_DIR.resolve()
 
-templates = Jinja2Templates(directory=str(CLIENT_DIR / "OperationManager"))
+# Shared Jinja environment and redirects (see utils/global_helpers.py)
+from ..utils.global_helpers import templates, redirect_to_login
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+EXPORT_SPOOL_MAX = 16 << 20
+EXPORT_BATCH_ROWS = 2000
+
+
+def iter_file_chunks(file_obj, chunk_size=64 * 1024):
+    """Yield a binary file from the start in fixed-size chunks, then close it."""
+    try:
+        file_obj.seek(0)
+        while chunk := file_obj.read(chunk_size):
+            yield chunk
+    finally:
+        file_obj.close()
 
 # ==========================================
 # 4. UNIVERSAL DOWNLOAD ENDPOINTS
 # ==========================================
 @router.get("/operation-manager")
 async def operation_manager_page(request: Request):
-    if not request.session.get("user"): return RedirectResponse(url="/login", status_code=303)
+    if not request.session.get("user"): return redirect_to_login()
     return templates.TemplateResponse(
     "operation_manager.html", 
     {"request": request}
 )
 
 @router.get("/download/{filename}")
-async def download_file(filename: str, request: Request):
+def download_file(filename: str, request: Request):
     if not request.session.get("user"):
         return Response("Unauthorized", status_code=401)
     
-    file_path = GENERATED_DIR / filename
-    if not file_path.exists():
+    # {filename} is a single path segment, so "." / ".." (or a Windows
+    # separator) are the only ways out of generated/. Checking the name
+    # avoids resolve(), which lstat()s every directory on the way.
+    if filename in (".", "..") or "/" in filename or os.sep in filename:
+        return Response("File not found", status_code=404)
+    file_path = GENERATED_ROOT / filename
+
+    # One stat serves as the existence check and is handed to FileResponse
+    try:
+        stat_result = os.stat(file_path)
+    except (FileNotFoundError, NotADirectoryError):
+        return Response("File not found", status_code=404)
+    if not S_ISREG(stat_result.st_mode):
         return Response("File not found", status_code=404)
         
+    # Names are reused across runs (e.g. Operation_Cleaned.xlsx), so the browser
+    # must not hand back an earlier download from its cache
     return FileResponse(
         path=file_path, 
         filename=filename, 
+        stat_result=stat_result,
+        headers={"Cache-Control": "private, no-cache"},
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 @router.get("/api/{table_type}/download")
@@ -71,34 +106,48 @@ def download_specific_table(table_type: str, session: Session = Depends(get_sess
     if table_type not in model_map:
         return {"status": "error", "message": "Invalid table type selected."}
     
-    model_class = model_map[table_type]
-    statement = select(model_class)
-    results = session.exec(statement).all()
+    table = model_map[table_type].__table__
+    # Rows are fetched in batches from a server-side cursor and written straight
+    # into the sheet; constant_memory flushes each row, so neither the table nor
+    # the sheet is ever held in memory as a whole
+    result = session.connection().execution_options(yield_per=EXPORT_BATCH_ROWS).execute(select(table))
     
-    if not results:
-        return {"status": "error", "message": f"No data found in {table_type} table."}
+    # Small exports stay in memory, large ones spill to a temp file
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX)
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+        "nan_inf_to_errors": True,
+    })
+    worksheet = workbook.add_worksheet("Report")
+    header_fmt = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    worksheet.write_row(0, 0, list(result.keys()), header_fmt)
     
-    data = [row.model_dump() for row in results]
-    df = pd.DataFrame(data)
+    row_count = 0
+    for row_count, row in enumerate(result, start=1):
+        worksheet.write_row(row_count, 0, row)
+    workbook.close()
     
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Report')
-    output.seek(0)
+    if not row_count:
+        output.close()
+        return {"status": "error", "message": f"No data found in {table_type} table."}
     
     filename = f"{table_type.capitalize()}_Export.xlsx"
     headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
     return StreamingResponse(
-        output, 
+        iter_file_chunks(output), 
         headers=headers, 
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
 @router.post("/api/operation/upload")
-async def upload_operation_data(file: UploadFile = File(...)):
+def upload_operation_data(file: UploadFile = File(...)):
     try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
+        # The upload is already spooled to a temp file; pandas reads it in place
+        # (sync route, so parsing runs in the threadpool). calamine parses the
+        # workbook in Rust instead of building openpyxl cell objects
+        df = pd.read_excel(file.file, engine="calamine")
         
         save_path = CLIENT_DIR / "OperationManager" / "processed_db_mock.csv"
         # Ensure dir exists
@@ -112,7 +161,7 @@ async def upload_operation_data(file: UploadFile = File(...)):
             }
         )
     except Exception as e:
-        print(f"Error processing file: {e}")
+        logger.error("Error processing file: %s", e)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": str(e)}
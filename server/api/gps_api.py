@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select, col
-from ..database import get_session
-from ..models import TripData
+from ..database import get_session, get_readonly_conn
+from ..models import TripData, GPSTripRow, GPSUpdateResult, GPSBulkUpdateResult
 from datetime import datetime
 import os
+import logging
+import re
 import io
-from sqlalchemy import text
+from sqlalchemy import text, Connection, bindparam
 import pandas as pd
 from pathlib import Path
 from contextlib import asynccontextmanager
@@ -36,11 +38,10 @@ from ..cleaner.operation_data_cleaner import process_operation_app_data
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CLIENT_DIR = BASE_DIR / "client"
 
-# 2. Initialize the specific template for GPS
-# Note: We name it 'templates' so your existing return statement works, 
-# but we remove the ["gps"] part.
-templates = Jinja2Templates(directory=str(CLIENT_DIR / "GPSCorner"))
+# Shared Jinja environment and redirects (see utils/global_helpers.py)
+from ..utils.global_helpers import templates, redirect_to_login
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 # ==========================================
@@ -49,20 +50,22 @@ router = APIRouter()
 
 @router.get("/gps-corner")
 async def gps_page(request: Request):
-    if not request.session.get("user"): return RedirectResponse(url="/login", status_code=303)
+    if not request.session.get("user"): return redirect_to_login()
     return templates.TemplateResponse("gps_corner.html", {"request": request, "user": request.session.get("user")})
 
 
+ISO_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
 # 1. THE GET ROUTE
-@router.get("/api/gps_trips", response_model=List[TripData])
+@router.get("/api/gps_trips", response_model=List[GPSTripRow])
 def read_gps_trips(
     date: str = None, 
     vehicle: str = None, 
     trip_direction: str = None,
-    session: Session = Depends(get_session)
+    conn: Connection = Depends(get_readonly_conn)
 ):
-    # Base query
-    query = select(TripData)
+    # Base query: only the columns the GPS cards use, not the full ~40-column row
+    query = select(*(getattr(TripData, name) for name in GPSTripRow.model_fields))
     
     # FILTER 1: Exclude 'Pay' status
     if hasattr(TripData, "clubbing_status"):
@@ -70,14 +73,15 @@ def read_gps_trips(
 
     # FILTER 2: Date 
     if date:
-        try:
-            # Parse HTML 'YYYY-MM-DD' -> Convert to DB 'DD-MM-YYYY'
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            formatted_date = date_obj.strftime("%d-%m-%Y")
+        # HTML 'YYYY-MM-DD' -> DB 'DD-MM-YYYY' by swapping the regex groups
+        match = ISO_DATE_RE.fullmatch(date)
+        if match:
+            year, month, day = match.groups()
+            formatted_date = f"{day}-{month}-{year}"
             
-            print(f"🔍 Searching for date: {formatted_date}") 
+            logger.debug("🔍 Searching for date: %s", formatted_date)
             query = query.where(TripData.shift_date.contains(formatted_date))
-        except ValueError:
+        else:
             # Fallback for simple string match
             query = query.where(TripData.shift_date.contains(date))
 
@@ -85,60 +89,86 @@ def read_gps_trips(
     if vehicle:
         query = query.where(TripData.cab_reg_no.contains(vehicle))
 
-    results = session.exec(query).all()
+    # Plain column mappings: nothing here needs ORM objects
+    results = conn.execute(query).mappings().all()
     return results
 
 # 2. THE UPDATE ROUTE (Using Unique ID)
 # ---------------------------------------------------------
 # ROBUST UPDATE ROUTE (Fixes Key Mismatch & Scientific Notation)
 # ---------------------------------------------------------
-@router.post("/api/update_gps/{unique_id}")
+# Column -> accepted payload keys, in order of preference
+GPS_PAYLOAD_KEYS = {
+    "journey_start_location": ("journey_start_location", "journey_start", "start"),
+    "journey_end_location": ("journey_end_location", "journey_end", "end"),
+    "gps_remark": ("gps_remark", "remark"),
+    "gps_time": ("gps_time",),
+}
+
+@router.post("/api/update_gps/{unique_id}", response_model=GPSUpdateResult)
 def update_gps_data(unique_id: str, payload: dict, session: Session = Depends(get_session)):
-    print(f"🔥 DEBUG: Request for Unique ID: {unique_id}")
-    print(f"📦 DEBUG: Data Received: {payload}")
+    logger.debug("🔥 Request for Unique ID: %s", unique_id)
+    logger.debug("📦 Data Received: %s", payload)
+
+    # 1. Pick the new values (Checking ALL possible key names, first one wins)
+    values = {}
+    for column, keys in GPS_PAYLOAD_KEYS.items():
+        key = next((k for k in keys if k in payload), None)
+        if key is not None:
+            values[column] = payload[key]
 
-    # 1. Find the trip
+    # 2. One UPDATE ... RETURNING instead of SELECT + flush + refresh
     # We strip whitespace just in case
     clean_id = str(unique_id).strip()
-    statement = select(TripData).where(col(TripData.unique_id) == clean_id)
-    trip = session.exec(statement).first()
+    card_columns = [getattr(TripData, name) for name in GPSTripRow.model_fields]
+    if values:
+        statement = update(TripData).where(col(TripData.unique_id) == clean_id).values(**values).returning(*card_columns)
+    else:
+        statement = select(*card_columns).where(col(TripData.unique_id) == clean_id)
+    trip = session.execute(statement).mappings().first()
     
     if not trip:
-        print(f"❌ DEBUG: Unique ID '{clean_id}' not found.")
+        logger.info("❌ Unique ID '%s' not found.", clean_id)
         raise HTTPException(status_code=404, detail="Trip not found")
 
-    # 2. UPDATE FIELDS (Checking BOTH possible key names)
-    
-    # Start Location
-    if "journey_start_location" in payload:
-        trip.journey_start_location = payload["journey_start_location"]
-    elif "journey_start" in payload:
-        trip.journey_start_location = payload["journey_start"]
-    elif "start" in payload:
-        trip.journey_start_location = payload["start"]
-
-    # End Location
-    if "journey_end_location" in payload:
-        trip.journey_end_location = payload["journey_end_location"]
-    elif "journey_end" in payload:
-        trip.journey_end_location = payload["journey_end"]
-    elif "end" in payload:
-        trip.journey_end_location = payload["end"]
-
-    # Remarks
-    if "gps_remark" in payload:
-        trip.gps_remark = payload["gps_remark"]
-    elif "remark" in payload:
-        trip.gps_remark = payload["remark"]
-
-    # GPS Time
-    if "gps_time" in payload:
-        trip.gps_time = payload["gps_time"]
-
     # 3. Save to DB
-    session.add(trip)
     session.commit()
-    session.refresh(trip)
     
-    print(f"✅ DEBUG: Saved to DB! Start={trip.journey_start_location}, End={trip.journey_end_location}")
-    return {"status": "success", "data": trip}
\ No newline at end of file
+    logger.debug("✅ Saved to DB! Start=%s, End=%s", trip['journey_start_location'], trip['journey_end_location'])
+    return {"status": "success", "data": trip}
+
+# 3. BULK UPDATE ROUTE: the editor saves many cards in one request
+@router.post("/api/update_gps_bulk", response_model=GPSBulkUpdateResult)
+def update_gps_bulk(payloads: List[dict], session: Session = Depends(get_session)):
+    # Rows are grouped by which columns they set, since one executemany
+    # needs the same parameters on every row
+    groups = {}
+    for payload in payloads:
+        uid = payload.get("unique_id")
+        if uid is None:
+            raise HTTPException(status_code=400, detail="Every row needs a unique_id")
+        values = {}
+        for column, keys in GPS_PAYLOAD_KEYS.items():
+            key = next((k for k in keys if k in payload), None)
+            if key is not None:
+                values[column] = payload[key]
+        if values:
+            values["uid"] = str(uid).strip()
+            groups.setdefault(tuple(sorted(values)), []).append(values)
+
+    # One UPDATE statement per column set, sent as executemany; one commit
+    table = TripData.__table__
+    conn = session.connection()
+    updated = 0
+    for columns, rows in groups.items():
+        statement = (
+            table.update()
+            .where(table.c.unique_id == bindparam("uid"))
+            .values({name: bindparam(name) for name in columns if name != "uid"})
+        )
+        result = conn.execute(statement, rows)
+        updated += result.rowcount if conn.dialect.supports_sane_multi_rowcount else len(rows)
+    session.commit()
+
+    logger.debug("✅ Bulk GPS save: %d rows", updated)
+    return {"status": "success", "updated": updated}
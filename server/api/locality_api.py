@@ -5,7 +5,9 @@ from ..models import TripData
 from datetime import datetime
 import os
 import io
-from sqlalchemy import text
+import json
+import time
+from sqlalchemy import func, text
 import pandas as pd
 from pathlib import Path
 from contextlib import asynccontextmanager
@@ -34,7 +36,8 @@ from ..models import LocalityMappingSchema,BulkMappingSchema, NewMasterSchema
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CLIENT_DIR = BASE_DIR / "client"
 
-templates = Jinja2Templates(directory=str(CLIENT_DIR / "LocalityCorner"))
+# Shared Jinja environment and redirects (see utils/global_helpers.py)
+from ..utils.global_helpers import templates, redirect_to_login
 
 router = APIRouter()
 # ==========================================
@@ -44,7 +47,7 @@ router = APIRouter()
 # 1. PAGE ROUTE
 @router.get("/locality-manager")
 async def locality_manager_page(request: Request):
-    if not request.session.get("user"): return RedirectResponse(url="/login", status_code=303)
+    if not request.session.get("user"): return redirect_to_login()
     return templates.TemplateResponse(
     "Localitycorner.html", 
     {"request": request, "user": request.session.get("user")}
@@ -53,20 +56,30 @@ async def locality_manager_page(request: Request):
 
 
 # 2. API: Get Dropdown Data (One-line fetch & format)
+# Masters change rarely, so each process keeps the encoded list; it is rebuilt
+# after DROPDOWN_TTL seconds (admin edits, other workers) or when
+# add-master-locality runs here
+DROPDOWN_TTL = 300
+_dropdown_cache = {"loaded_at": 0.0, "body": None}
+
 @router.get("/api/dropdown-localities/")
 def get_master_localities(session: Session = Depends(get_session)):
-    return [
-        {**loc.model_dump(), "billing_km": km or "-"} 
-        for loc, km in session.exec(
-            select(T3LocalityZone, T3ZoneKm.km)
-            .join(T3ZoneKm, T3LocalityZone.zone == T3ZoneKm.zone, isouter=True)
-            .order_by(T3LocalityZone.locality)
-        ).all()
-    ]
+    now = time.monotonic()
+    if _dropdown_cache["body"] is None or now - _dropdown_cache["loaded_at"] > DROPDOWN_TTL:
+        rows = [
+            {**loc.model_dump(), "billing_km": km or "-"} 
+            for loc, km in session.exec(
+                select(T3LocalityZone, T3ZoneKm.km)
+                .join(T3ZoneKm, T3LocalityZone.zone == T3ZoneKm.zone, isouter=True)
+                .order_by(T3LocalityZone.locality)
+            ).all()
+        ]
+        _dropdown_cache.update(loaded_at=now, body=json.dumps(rows).encode())
+    return Response(content=_dropdown_cache["body"], media_type="application/json")
 
 # 3. API: View All / Pagination
 @router.get("/api/localities/")
-def get_address_table(page: int = 1, search: str = "", session: Session = Depends(get_session)):
+def get_address_table(page: int = 1, search: str = "", after_id: Optional[int] = None, session: Session = Depends(get_session)):
     limit = 20
     offset = (page - 1) * limit
     
@@ -79,10 +92,24 @@ def get_address_table(page: int = 1, search: str = "", session: Session = Depend
     if search:
         query = query.where(T3AddressLocality.address.contains(search))
     
-    total_records = len(session.exec(select(T3AddressLocality).where(T3AddressLocality.address.contains(search))).all())
-    pending_count = len(session.exec(select(T3AddressLocality).where(col(T3AddressLocality.locality).is_(None))).all())
+    # Counted in SQL: the DB returns one integer instead of every matching row
+    total_records = session.exec(
+        select(func.count()).select_from(T3AddressLocality).where(T3AddressLocality.address.contains(search))
+    ).one()
+    pending_count = session.exec(
+        select(func.count()).select_from(T3AddressLocality).where(col(T3AddressLocality.locality).is_(None))
+    ).one()
     
-    results = session.exec(query.offset(offset).limit(limit)).all()
+    # Keyset: with the last id of the previous page the index seeks straight to
+    # the next rows; `page` alone still works (OFFSET) for direct links
+    if after_id is not None:
+        query = query.where(T3AddressLocality.id < after_id)
+    else:
+        query = query.offset(offset)
+    # One extra row tells whether there is a next page at all
+    results = session.exec(query.limit(limit + 1)).all()
+    has_more = len(results) > limit
+    results = results[:limit]
     
     data = []
     for address_row, locality_row, zone_km_row in results:
@@ -98,7 +125,10 @@ def get_address_table(page: int = 1, search: str = "", session: Session = Depend
         
     return {
         "results": data,
-        "pagination": {"total_pages": (total_records // limit) + 1},
+        "pagination": {
+            "total_pages": (total_records // limit) + 1,
+            "next_after_id": data[-1]["id"] if has_more else None
+        },
         "global_pending": pending_count
     }
 
@@ -111,73 +141,83 @@ def get_next_pending(session: Session = Depends(get_session)):
     return {"found": True, "data": row}
 
 # 5. API: Save Single Mapping
+def mapping_values(locality_name):
+    """
+    SET values for a locality mapping. The cached zone/km are scalar subqueries
+    evaluated inside the UPDATE, so no separate lookup round trip is needed.
+    """
+    zone = select(T3LocalityZone.zone).where(T3LocalityZone.locality == locality_name)
+    km = (
+        select(T3ZoneKm.km)
+        .join(T3LocalityZone, T3LocalityZone.zone == T3ZoneKm.zone)
+        .where(T3LocalityZone.locality == locality_name)
+    )
+    return {"locality": locality_name, "zone": zone.scalar_subquery(), "km": km.scalar_subquery()}
+
 @router.post("/api/save-mapping/")
 def save_mapping(data: LocalityMappingSchema, session: Session = Depends(get_session)):
-    row = session.get(T3AddressLocality, data.address_id)
-    if not row:
+    # Update Relation + Cache Fields (Zone/KM) in one statement
+    statement = (
+        update(T3AddressLocality)
+        .where(col(T3AddressLocality.id) == data.address_id)
+        .values(**mapping_values(data.locality_name))
+    )
+    result = session.exec(statement)
+    if not result.rowcount:
         return JSONResponse({"success": False, "error": "Address not found"}, status_code=404)
-    
-    # Update Relation
-    row.locality = data.locality_name
-    
-    # Update Cache Fields (Zone/KM) automatically
-    locality_info = session.exec(
-        select(T3LocalityZone, T3ZoneKm)
-        .join(T3ZoneKm, T3LocalityZone.zone == T3ZoneKm.zone, isouter=True)
-        .where(T3LocalityZone.locality == data.locality_name)
-    ).first()
-
-    if locality_info:
-        loc_row, km_row = locality_info
-        row.zone = loc_row.zone
-        row.km = km_row.km if km_row else None
-
-    session.add(row)
+
     session.commit()
     return {"success": True}
 
 # 6. API: Search Pending
 @router.get("/api/search-pending/")
-def search_pending(q: str = "", page: int = 1, session: Session = Depends(get_session)):
+def search_pending(q: str = "", page: int = 1, after_id: Optional[int] = None, session: Session = Depends(get_session)):
     limit = 50
     offset = (page - 1) * limit
     
-    query = select(T3AddressLocality).where(col(T3AddressLocality.locality).is_(None))
+    filters = [col(T3AddressLocality.locality).is_(None)]
     if q:
-        query = query.where(T3AddressLocality.address.contains(q))
+        filters.append(T3AddressLocality.address.contains(q))
+    query = select(T3AddressLocality).where(*filters)
         
-    total = len(session.exec(query).all())
-    results = session.exec(query.offset(offset).limit(limit)).all()
+    total = session.exec(select(func.count()).select_from(T3AddressLocality).where(*filters)).one()
+    # Same keyset scheme as /api/localities/, in id order
+    query = query.order_by(T3AddressLocality.id)
+    if after_id is not None:
+        query = query.where(T3AddressLocality.id > after_id)
+    else:
+        query = query.offset(offset)
+    results = session.exec(query.limit(limit + 1)).all()
+    has_more = len(results) > limit
+    results = results[:limit]
     
     return {
         "results": results,
-        "pagination": {"total_records": total}
+        "pagination": {
+            "total_records": total,
+            "next_after_id": results[-1].id if has_more else None
+        }
     }
 
 # 7. API: Bulk Save
+BULK_SAVE_CHUNK = 500
+
 @router.post("/api/bulk-save/")
 def bulk_save(data: BulkMappingSchema, session: Session = Depends(get_session)):
-    cache_values = {"locality": data.locality_name}
-    
-    locality_info = session.exec(
-        select(T3LocalityZone, T3ZoneKm)
-        .join(T3ZoneKm, T3LocalityZone.zone == T3ZoneKm.zone, isouter=True)
-        .where(T3LocalityZone.locality == data.locality_name)
-    ).first()
-
-    if locality_info:
-        loc_row, km_row = locality_info
-        cache_values["zone"] = loc_row.zone
-        cache_values["km"] = km_row.km if km_row else None
-
-    statement = (
-        update(T3AddressLocality)
-        .where(col(T3AddressLocality.id).in_(data.address_ids))
-        .values(**cache_values)
-    )
-    result = session.exec(statement)
+    # IN lists are sent BULK_SAVE_CHUNK ids at a time to stay under driver
+    # parameter limits (SQLite: 999); one transaction, one commit
+    values = mapping_values(data.locality_name)
+    count = 0
+    for start in range(0, len(data.address_ids), BULK_SAVE_CHUNK):
+        chunk = data.address_ids[start:start + BULK_SAVE_CHUNK]
+        statement = (
+            update(T3AddressLocality)
+            .where(col(T3AddressLocality.id).in_(chunk))
+            .values(**values)
+        )
+        count += session.exec(statement).rowcount
     session.commit()
-    return {"success": True, "count": result.rowcount}
+    return {"success": True, "count": count}
 
 # 8. API: Add New Master Locality
 @router.post("/api/add-master-locality/")
@@ -190,6 +230,7 @@ def add_master(data: NewMasterSchema, session: Session = Depends(get_session)):
         new_loc = T3LocalityZone(locality=data.locality_name, zone=data.zone_name)
         session.add(new_loc)
         session.commit()
+        _dropdown_cache["body"] = None
         return {"success": True}
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)}, status_code=400)
\ No newline at end of file
@@ -20,7 +20,7 @@ from sqladmin import Admin, ModelView
 from sqladmin.authentication import AuthenticationBackend
 
 # --- INTERNAL IMPORTS ---
-from ..auth import verify_password, get_password_hash
+from ..auth import verify_password, get_password_hash, get_user_password_hash
 from ..database import create_db_and_tables, get_session, engine
 from ..models import User, ClientData, RawTripData, OperationData, TripData, T3AddressLocality, T3LocalityZone, T3ZoneKm, BARowData
 from ..cleaner.mis_data_cleaner import process_client_data, process_raw_data,process_ba_row_data
@@ -30,11 +30,8 @@ from ..cleaner.operation_data_cleaner import process_operation_app_data
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CLIENT_DIR = BASE_DIR / "client"
 
-# 2. Define Templates
-templates = {
-    "home": Jinja2Templates(directory=str(CLIENT_DIR / "HomePage")),
-    "login": Jinja2Templates(directory=str(CLIENT_DIR / "LoginPage")),
-}
+# Shared Jinja environment and redirects (see utils/global_helpers.py)
+from ..utils.global_helpers import templates, redirect_to_login, redirect_to_home
 
 router = APIRouter()
 
@@ -43,27 +40,27 @@ router = APIRouter()
 async def read_root(request: Request):
     user = request.session.get("user")
     if not user:
-        return RedirectResponse(url="/login", status_code=303)
-    return templates["home"].TemplateResponse("homepage.html", {"request": request, "user": user})
+        return redirect_to_login()
+    return templates.TemplateResponse("homepage.html", {"request": request, "user": user})
 
 @router.get("/login")
 async def login_page(request: Request):
     if request.session.get("user"):
-        return RedirectResponse(url="/", status_code=303)
-    return templates["login"].TemplateResponse("login.html", {"request": request})
+        return redirect_to_home()
+    return templates.TemplateResponse("login.html", {"request": request})
 
 @router.post("/login")
-async def login_user(request: Request, username: str = Form(...), password: str = Form(...), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.username == username)).first()
-    if user and verify_password(password, user.password_hash):
-        request.session["user"] = user.username
-        return RedirectResponse(url="/", status_code=303)
-    return templates["login"].TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
+def login_user(request: Request, username: str = Form(...), password: str = Form(...), session: Session = Depends(get_session)):
+    password_hash = get_user_password_hash(session, username)
+    if password_hash and verify_password(password, password_hash):
+        request.session["user"] = username
+        return redirect_to_home()
+    return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
 
 @router.get("/logout")
 async def logout(request: Request):
     request.session.clear()
-    return RedirectResponse(url="/")
+    return redirect_to_home(307)
 
 
 
@@ -1,4 +1,14 @@
+import time
+
 import bcrypt
+from sqlmodel import Session, select
+
+from .models import User
+
+# username -> (expires_at, password_hash); short-lived so repeated login
+# attempts skip the query. Cleared by UserAdmin on any user change.
+USER_HASH_TTL = 30
+_user_hash_cache = {}
 
 def get_password_hash(password: str) -> str:
   
@@ -19,4 +29,21 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     hash_bytes = hashed_password.encode('utf-8')
     
     # 2. Check using bcrypt
-    return bcrypt.checkpw(pwd_bytes, hash_bytes)
\ No newline at end of file
+    return bcrypt.checkpw(pwd_bytes, hash_bytes)
+
+def get_user_password_hash(session: Session, username: str):
+    
+    # 1. Recent lookups come from the TTL cache
+    cached = _user_hash_cache.get(username)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    # 2. Single-column scalar query on the unique username index
+    password_hash = session.scalar(select(User.password_hash).where(User.username == username))
+    if password_hash is None:
+        return None
+    _user_hash_cache[username] = (time.monotonic() + USER_HASH_TTL, password_hash)
+    return password_hash
+
+def clear_user_hash_cache() -> None:
+    _user_hash_cache.clear()
@@ -2,18 +2,27 @@ import pandas as pd
 import numpy as np
 import pdfplumber
 import io
+import logging
+import mmap
 import re
+import time
+from contextlib import contextmanager
+from sqlalchemy import Integer, String, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select, col
 import xlrd
 from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl.styles import PatternFill, Font, Alignment, Border, Side, NamedStyle
 import traceback
 from openpyxl.utils import get_column_letter
 
 #=================================================================
-from ..models import OperationData
+from ..models import OperationData, T3AddressLocality
 #=================================================================
 
+logger = logging.getLogger(__name__)
+
 
 #=================================================================
 
@@ -124,6 +133,37 @@ def clean_columns(columns):
     return cleaned
 
 
+def as_file_source(content):
+    """
+    Readable source for pandas/pdfplumber: raw bytes are wrapped in BytesIO,
+    file objects (e.g. an upload's spooled temp file) are rewound and used as-is.
+    """
+    if isinstance(content, (bytes, bytearray)):
+        return io.BytesIO(content)
+    content.seek(0)
+    return content
+
+
+@contextmanager
+def xls_contents(content):
+    """
+    Whole-workbook contents for xlrd's file_contents. A file-backed upload is
+    memory-mapped rather than read into a second copy; the map is closed when
+    the block exits. Objects without a file descriptor are read.
+    """
+    if isinstance(content, (bytes, bytearray)):
+        yield content
+        return
+    content.seek(0)
+    try:
+        buf = mmap.mmap(content.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        yield content.read()
+        return
+    with buf:
+        yield buf
+
+
 def clean_address(series: pd.Series) -> pd.Series:
     """
     Cleans address text exactly like:
@@ -211,6 +251,59 @@ def format_excel_sheet(ws):
             ws.column_dimensions[col_letter].width = 30
 
 
+def add_sheet_styles(wb):
+    """
+    Registers the named styles used to format a write-only sheet
+    (same look as format_excel_sheet, applied while rows are streamed):
+    - sheet_header: blue fill, bold white Cambria
+    - sheet_body / sheet_body_yellow: Cambria, centered + wrapped, thin border
+    - red_remark / yellow_remark: mis_remark highlight for Cancel / Alt Veh rows
+    """
+    border = Border(
+        left=Side(style="thin"),
+        right=Side(style="thin"),
+        top=Side(style="thin"),
+        bottom=Side(style="thin")
+    )
+    align_center_wrap = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+    wb.add_named_style(NamedStyle(
+        name="sheet_header",
+        fill=PatternFill(start_color="0070C0", end_color="0070C0", fill_type="solid"),
+        font=Font(name="Cambria", size=12, bold=True, color="FFFFFF"),
+        alignment=align_center_wrap,
+        border=border
+    ))
+    wb.add_named_style(NamedStyle(name="sheet_body", font=Font(name="Cambria"), alignment=align_center_wrap, border=border))
+    wb.add_named_style(NamedStyle(name="sheet_body_yellow", font=Font(name="Cambria"), fill=yellow_fill, alignment=align_center_wrap, border=border))
+    wb.add_named_style(NamedStyle(name="red_remark", font=Font(name="Cambria", bold=True, color="FF0000"), alignment=align_center_wrap, border=border))
+    wb.add_named_style(NamedStyle(name="yellow_remark", font=Font(name="Cambria", bold=True), fill=yellow_fill, alignment=align_center_wrap, border=border))
+
+
+def format_write_only_sheet(ws, headers, columns):
+    """
+    Write-only counterpart of format_excel_sheet's sizing rules.
+    Must be called before the first ws.append():
+    - Row height = 30
+    - Auto-fit columns from header + values
+    """
+    ws.sheet_format.defaultRowHeight = 30
+    ws.sheet_format.customHeight = True
+
+    for col_idx, (header, values) in enumerate(zip(headers, columns), 1):
+        col_letter = get_column_letter(col_idx)
+        max_length = max((len(str(v)) for v in values if v), default=0)
+        if header:
+            max_length = max(max_length, len(str(header)))
+        ws.column_dimensions[col_letter].width = max_length + 2
+
+        if header == "EMPLOYEE ADDRESS":
+            ws.column_dimensions[col_letter].width = 80
+        elif header == "EMPLOYEE NAME":
+            ws.column_dimensions[col_letter].width = 30
+
+
 
 def standardize_dataframe(df):
     """
@@ -252,7 +345,7 @@ def standardize_dataframe(df):
     final_order = target_cols + extra_cols + ['unique_id']
     return df[final_order]
 
-def get_xls_style_data(book, xf_index, row_idx, col_idx):
+def get_xls_style_data(book, xf_index, row_idx=None, col_idx=None):
     """
     Extracts background and font colors from legacy .xls files.
     Includes debug prints to identify why colors might be missed.
@@ -288,13 +381,16 @@ def get_xls_style_data(book, xf_index, row_idx, col_idx):
                 bg_hex = "FFFF00"
 
         # --- DEBUG LOGGING ---
-        # Only print for non-default styles to keep console clean
+        # Only log non-default styles to keep the output readable
         if font_hex == "FF0000" or bg_hex == "FFFF00":
-            print(f"[DEBUG STYLE] Row {row_idx}, Col {col_idx} | FontIdx: {f_idx} (Hex: {font_hex}) | BgIdx: {bg_idx} (Hex: {bg_hex})")
+            logger.debug(
+                "[DEBUG STYLE] Row %s, Col %s | FontIdx: %s (Hex: %s) | BgIdx: %s (Hex: %s)",
+                row_idx, col_idx, f_idx, font_hex, bg_idx, bg_hex,
+            )
 
         return bg_hex, font_hex, bool(font.bold)
     except Exception as e:
-        print(f"[DEBUG ERROR] Style extraction failed at Row {row_idx}, Col {col_idx}: {e}")
+        logger.debug("[DEBUG ERROR] Style extraction failed at Row %s, Col %s: %s", row_idx, col_idx, e)
         return None, None, False    
 
 
@@ -328,6 +424,31 @@ def create_styled_excel(df, filename_prefix="Cleaned"):
     return df, output, f"{filename_prefix}.xlsx"
 
 # --- HELPER FUNCTIONS ---
+BULK_INSERT_CHUNK = 10_000
+# At this size bulk_save_unique switches to COPY on Postgres
+COPY_MIN_ROWS = 50_000
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING (+ RETURNING)
+UPSERT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+# Addresses this process already knows are in t3_address_locality, so repeat
+# uploads don't send them again. Dropped every KNOWN_ADDRESS_TTL seconds so
+# addresses deleted elsewhere (admin, another worker) are picked up again
+KNOWN_ADDRESS_TTL = 60
+_known_addresses = {"loaded_at": 0.0, "addresses": set()}
+
+def known_t3_addresses(session: Session, load_all: bool = False) -> set:
+    """The cached address set, refreshed once the TTL is up (from the table when load_all)."""
+    now = time.monotonic()
+    if now - _known_addresses["loaded_at"] > KNOWN_ADDRESS_TTL:
+        fresh = set()
+        if load_all:
+            # Streamed in batches into the set, no intermediate list of every address
+            rows = session.exec(select(T3AddressLocality.address).execution_options(yield_per=10_000))
+            fresh.update(rows)
+        _known_addresses.update(loaded_at=now, addresses=fresh)
+    return _known_addresses["addresses"]
+
 def bulk_save_unique(session: Session, model_class, df: pd.DataFrame, unique_col: str = "unique_id") -> int:
     """Helper to insert only new rows into database based on a unique column."""
     if df is None or df.empty or unique_col not in df.columns:
@@ -336,16 +457,88 @@ def bulk_save_unique(session: Session, model_class, df: pd.DataFrame, unique_col
     incoming_ids = df[unique_col].dropna().unique().tolist()
     if not incoming_ids: return 0
 
-    existing_ids = set(session.exec(select(getattr(model_class, unique_col)).where(col(getattr(model_class, unique_col)).in_(incoming_ids))).all())
-    new_rows = df[~df[unique_col].isin(existing_ids)]
+    table = model_class.__table__
+    upsert_insert = UPSERT_INSERTS.get(session.get_bind().dialect.name)
+    if upsert_insert is not None:
+        # The unique index does the dedup: ON CONFLICT DO NOTHING skips ids
+        # already stored, so no SELECT of existing ids is needed first
+        stmt = upsert_insert(table).on_conflict_do_nothing(index_elements=[unique_col]).returning(table.c[unique_col])
+        new_rows = df
+    else:
+        # isin() hashes the id list itself, so no Python set is built first
+        existing_ids = session.exec(select(getattr(model_class, unique_col)).where(col(getattr(model_class, unique_col)).in_(incoming_ids))).all()
+        new_rows = df[~df[unique_col].isin(existing_ids)]
+        stmt = insert(table)
+    # repeats inside the upload would break the unique index, keep the first
+    new_rows = new_rows.drop_duplicates(subset=unique_col)
     
     if not new_rows.empty:
-        records = [model_class(**row.where(pd.notnull(row), None).to_dict()) for _, row in new_rows.iterrows()]
-        session.add_all(records)
+        # One Core executemany (multi-row VALUES) instead of an ORM object per row;
+        # extra DataFrame columns that aren't in the table are dropped first
+        table_cols = [c for c in new_rows.columns if c in table.columns]
+        new_rows = new_rows[table_cols]
+        # Built and sent BULK_INSERT_CHUNK rows at a time so a large upload never
+        # holds every record dict at once; one commit at the end
+        # Text columns are cast in one vectorized pass so every bound value
+        # matches the model's str fields (missing stays None)
+        text_cols = [c for c in table_cols if isinstance(table.columns[c].type, String)]
+        if len(new_rows) >= COPY_MIN_ROWS and session.get_bind().dialect.name == "postgresql":
+            inserted = copy_insert_unique(session, table, new_rows, unique_col, text_cols)
+            session.commit()
+            return inserted
+        inserted = 0
+        for start in range(0, len(new_rows), BULK_INSERT_CHUNK):
+            chunk = new_rows.iloc[start:start + BULK_INSERT_CHUNK].astype({c: "string" for c in text_cols})
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict(orient="records")
+            result = session.execute(stmt, records)
+            # With ON CONFLICT only the RETURNING rows were actually inserted
+            inserted += len(result.all()) if upsert_insert is not None else len(records)
         session.commit()
-        return len(new_rows)
+        return inserted
     return 0
 
+# Characters COPY's text format treats specially inside a value
+_COPY_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_text_field(values: pd.Series) -> pd.Series:
+    """One column in COPY text format: escaped values, \\N for NULL."""
+    return values.astype("string").str.translate(_COPY_TEXT_ESCAPES).fillna("\\N")
+
+
+def copy_insert_unique(session: Session, table, df: pd.DataFrame, unique_col: str, text_cols) -> int:
+    """
+    Postgres path for big uploads: rows are streamed with COPY into a temp
+    staging table, then one INSERT ... SELECT ... ON CONFLICT DO NOTHING moves
+    the new ones across. Works with both psycopg2 and psycopg 3.
+    """
+    staging = f'"staging_{table.name}"'
+    col_list = ", ".join(f'"{c}"' for c in df.columns)
+    # Text format: values are backslash-escaped, so a literal "\N" can't pass for NULL
+    copy_sql = f"COPY {staging} ({col_list}) FROM STDIN"
+    int_cols = [c for c in df.columns if isinstance(table.columns[c].type, Integer)]
+
+    cursor = session.connection().connection.cursor()
+    try:
+        # Same column types, no constraints or serial defaults
+        cursor.execute(f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {col_list} FROM "{table.name}" WITH NO DATA')
+        for start in range(0, len(df), BULK_INSERT_CHUNK):
+            chunk = df.iloc[start:start + BULK_INSERT_CHUNK].astype({c: "string" for c in text_cols} | {c: "Int64" for c in int_cols})
+            fields = [_copy_text_field(chunk[c]) for c in chunk.columns]
+            data = "\n".join(fields[0].str.cat(fields[1:], sep="\t")) + "\n"
+            if hasattr(cursor, "copy"):  # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(data)
+            else:  # psycopg2
+                cursor.copy_expert(copy_sql, io.StringIO(data))
+        cursor.execute(
+            f'INSERT INTO "{table.name}" ({col_list}) SELECT {col_list} FROM {staging} '
+            f'ON CONFLICT ("{unique_col}") DO NOTHING'
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
 def sync_addresses_to_t3(session: Session, df: pd.DataFrame) -> int:
     """
     Extracts unique addresses from the uploaded dataframe and adds NEW ones
@@ -361,13 +554,14 @@ def sync_addresses_to_t3(session: Session, df: pd.DataFrame) -> int:
             break
     
     if not address_col:
-        print("⚠️ T3 Sync: No address column found in uploaded file.")
+        logger.warning("⚠️ T3 Sync: No address column found in uploaded file.")
         return 0
 
     # 2. Extract Unique Addresses from File
+    # Trip rows repeat the same addresses many times, so dedupe before the
+    # cast/strip and only the distinct values go through the string ops
     file_addresses = set(
-        df[address_col]
-        .dropna()
+        pd.Series(df[address_col].dropna().unique())
         .astype(str)
         .str.strip()
         .unique()
@@ -377,47 +571,64 @@ def sync_addresses_to_t3(session: Session, df: pd.DataFrame) -> int:
     if not file_addresses:
         return 0
 
-    # 3. Find Addresses ALREADY in Database
-    # Fetch all existing addresses to compare against
-    # Use chunking if you have millions of rows, but for thousands, this is fine.
-    existing_db_addresses = set(session.exec(select(T3AddressLocality.address)).all())
-    
-    # 4. Filter New Addresses
-    new_addresses_list = list(file_addresses - existing_db_addresses)
+    # 3. Let the unique address index skip addresses ALREADY in Database
+    # (ON CONFLICT DO NOTHING), so the address table is never read into Python;
+    # ones this process has recently seen aren't sent at all
+    table = T3AddressLocality.__table__
+    upsert_insert = UPSERT_INSERTS.get(session.get_bind().dialect.name)
+    if upsert_insert is not None:
+        stmt = upsert_insert(table).on_conflict_do_nothing(index_elements=["address"]).returning(table.c.id)
+        known = known_t3_addresses(session)
+    else:
+        # 4. Other dialects compare against the whole table (cached for the TTL)
+        stmt = insert(table)
+        known = known_t3_addresses(session, load_all=True)
+    new_addresses_list = list(file_addresses - known)
 
     if not new_addresses_list:
-        print("✅ T3 Sync: All addresses already exist.")
+        logger.info("✅ T3 Sync: All addresses already exist.")
         return 0
 
-    print(f"📍 T3 Sync: Found {len(new_addresses_list)} NEW addresses. Inserting...")
+    logger.info("📍 T3 Sync: Checking %d addresses. Inserting new ones...", len(new_addresses_list))
 
-    # 5. Insert One-by-One to Isolate Failures (Safer for debugging conflicts)
-    # Or Bulk Insert if confident. Let's try a safer Bulk approach.
-    
-    records = [T3AddressLocality(address=addr, locality=None) for addr in new_addresses_list]
+    # 5. Bulk Insert as Core executemany (plain dicts, no ORM objects to track),
+    # BULK_INSERT_CHUNK rows per call like bulk_save_unique; one commit
+    records = [{"address": addr, "locality": None} for addr in new_addresses_list]
+
+    def insert_records():
+        inserted = 0
+        for start in range(0, len(records), BULK_INSERT_CHUNK):
+            batch = records[start:start + BULK_INSERT_CHUNK]
+            result = session.execute(stmt, batch)
+            # With ON CONFLICT only the RETURNING rows were actually inserted
+            inserted += len(result.all()) if upsert_insert is not None else len(batch)
+        return inserted
     
     try:
-        session.add_all(records)
+        inserted = insert_records()
         session.commit()
-        return len(records)
+        # every file address is in the table now, inserted or not
+        known.update(file_addresses)
+        return inserted
     except Exception as e:
         session.rollback()
-        print(f"❌ T3 Sync Error: {e}")
+        logger.error("❌ T3 Sync Error: %s", e)
         
         # AUTO-FIX: Attempt to reset the ID sequence if it's a Primary Key error
         if "t3_address_locality_pkey" in str(e) or "UniqueViolation" in str(e):
-            print("🔧 Attempting to fix ID sequence...")
+            logger.info("🔧 Attempting to fix ID sequence...")
             try:
                 # This SQL command resets the ID counter to the max ID + 1
                 session.exec(text("SELECT setval(pg_get_serial_sequence('t3_address_locality', 'id'), coalesce(max(id),0) + 1, false) FROM t3_address_locality;"))
                 session.commit()
                 
                 # Retry Insert
-                print("🔄 Retrying insert after sequence fix...")
-                session.add_all(records)
+                logger.info("🔄 Retrying insert after sequence fix...")
+                inserted = insert_records()
                 session.commit()
-                return len(records)
+                known.update(file_addresses)
+                return inserted
             except Exception as retry_e:
-                print(f"❌ Retry Failed: {retry_e}")
+                logger.error("❌ Retry Failed: %s", retry_e)
                 return 0
         return 0
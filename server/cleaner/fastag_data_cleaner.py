@@ -8,6 +8,8 @@ from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 import traceback
 
+from .cleaner_helper import as_file_source
+
 # ==========================================
 # HELPER: ICICI SPECIFIC CLEANER
 # ==========================================
@@ -101,15 +103,6 @@ def _clean_columns(columns):
     )
     return cleaned
 
-def _clean_cell_value(x):
-    """Normalizes spaces and handles None/NaN"""
-    if isinstance(x, str):
-        x = x.replace("\n", " ").replace("\t", " ")
-        x = re.sub(r"\s+", " ", x).strip()
-        if x.lower() in ["na", "n/a", "null", "none", ""]:
-            return np.nan
-        return x
-    return x
 
 # ==========================================
 # HELPER: ICICI SPECIFIC CLEANER (YOUR PERFECT CODE)
@@ -256,15 +249,17 @@ def _clean_columns(columns):
     )
     return cleaned
 
-def _clean_cell_value(x):
-    """Normalizes spaces and handles None/NaN"""
-    if isinstance(x, str):
-        x = x.replace("\n", " ").replace("\t", " ")
-        x = re.sub(r"\s+", " ", x).strip()
-        if x.lower() in ["na", "n/a", "null", "none", ""]:
-            return np.nan
-        return x
-    return x
+NULL_TOKENS = ["na", "n/a", "null", "none", ""]
+
+def _clean_cell_values(series):
+    """Normalizes spaces and null-like text in a column; non-string cells are left as-is"""
+    try:
+        cleaned = series.str.replace(r"\s+", " ", regex=True).str.strip()
+    except AttributeError:
+        return series  # no text in this column
+    # .str gives NaN for non-string cells, so those keep their original value
+    result = series.where(cleaned.isna(), cleaned)
+    return result.mask(cleaned.str.lower().isin(NULL_TOKENS), np.nan)
 
 def _clean_datetime(x):
     """Fixes broken years (2 025) and time spacing"""
@@ -324,7 +319,7 @@ def _process_idfc(pdf_obj):
         df.columns = df.columns.str.replace(k, v, regex=False)
 
     for col in df.columns:
-        df[col] = df[col].apply(_clean_cell_value)
+        df[col] = _clean_cell_values(df[col])
 
     # 4. 🔥 REPAIR SPLIT ROWS (Merging wrapped IDs)
     if "travel_date_time" in df.columns and "unique_transaction_id" in df.columns:
@@ -355,24 +350,19 @@ def _process_idfc(pdf_obj):
         if "vehicle_number" not in df.columns:
             df["vehicle_number"] = None
 
-        current_vehicle = None
-        rows_to_drop = []
+        # A header row names the vehicle (and has no date); every row below it
+        # belongs to that vehicle until the next header, so forward-fill it
+        vals = df["travel_date_time"].fillna("").astype(str).str.strip()
+        plate = vals.str.replace(" ", "").str.extract(r'([A-Z]{2}[0-9]{1,2}[A-Z]{0,3}[0-9]{4})', expand=False)
+        is_header = plate.notna() & ~vals.str.contains(r'\d{2}-\d{2}-\d{4}')
+        current_vehicle = plate.where(is_header).ffill()
 
-        for idx, row in df.iterrows():
-            val = str(row["travel_date_time"]).strip()
-            match = re.search(r'([A-Z]{2}[0-9]{1,2}[A-Z]{0,3}[0-9]{4})', val.replace(" ", ""))
-            is_date = re.search(r'\d{2}-\d{2}-\d{4}', val)
-            
-            if match and not is_date:
-                current_vehicle = match.group(1)
-                rows_to_drop.append(idx)
-            else:
-                existing_veh = str(row.get("vehicle_number", "")).strip()
-                if current_vehicle and (existing_veh == "" or existing_veh.lower() == "nan"):
-                    df.at[idx, "vehicle_number"] = current_vehicle
+        existing_veh = df["vehicle_number"].fillna("").astype(str).str.strip()
+        missing_veh = existing_veh.eq("") | existing_veh.str.lower().eq("nan")
+        fill = ~is_header & missing_veh & current_vehicle.notna()
+        df.loc[fill, "vehicle_number"] = current_vehicle[fill]
 
-        if rows_to_drop:
-            df = df.drop(rows_to_drop).reset_index(drop=True)
+        df = df[~is_header].reset_index(drop=True)
 
     # 6. Cleaning Helpers
     def _clean_vehicle_no(x):
@@ -715,7 +705,7 @@ def _process_indus(pdf_obj):
 # ==========================================
 def process_fastag_data(file_data_list):
     """
-    file_data_list: List of tuples -> [(filename, bytes), (filename, bytes)]
+    file_data_list: List of tuples -> [(filename, bytes or file object), ...]
     """
     try:
         print(f"🔹 Starting Fastag Processing for {len(file_data_list)} files...")
@@ -726,7 +716,7 @@ def process_fastag_data(file_data_list):
             try:
                 fname_lower = filename.lower()
                 
-                with pdfplumber.open(io.BytesIO(content)) as pdf:
+                with pdfplumber.open(as_file_source(content)) as pdf:
                     df_temp = None
                     
                     if "idfc.pdf" in fname_lower:
@@ -780,13 +770,13 @@ def process_fastag_data(file_data_list):
             mask = final_df["Travel Date Time"].astype(str).str.lower().str.contains("date|total|page", na=False)
             final_df = final_df[~mask]
 
+        # "string" dtype keeps missing plates as <NA> instead of "nan"/"None" text
         final_df["Vehicle No"] = (
-            final_df["Vehicle No"].astype(str)
+            final_df["Vehicle No"].astype("string")
             .str.replace(" ", "", regex=False)
             .str.replace("-", "", regex=False)
             .str.upper()
-            .replace("NAN", "")
-            .replace("NONE", "")
+            .fillna("")
         )
 
         final_df["Tag Dr/Cr"] = pd.to_numeric(
@@ -17,7 +17,8 @@ from .cleaner_helper import (
     standardize_dataframe, 
     format_excel_sheet,
     clean_columns,
-    clean_address
+    clean_address,
+    as_file_source
 )
 
 
@@ -51,7 +52,7 @@ def process_client_data(file_content):
             "Flight Route": "flight_route", "Flight Type": "flight_type"
         }
         
-        df = pd.read_excel(io.BytesIO(file_content), dtype=str)
+        df = pd.read_excel(as_file_source(file_content), dtype=str)
         
         # 1. Drop Unwanted
         df = df.drop(columns=[c for c in DROP_COLS if c in df.columns], errors='ignore')
@@ -140,22 +141,32 @@ def _clean_single_raw_df(df):
         traceback.print_exc()
         return pd.DataFrame()
 
-def process_raw_data(file_list_bytes):
-    all_dfs = []
-    for filename, content in file_list_bytes: # Added filename to loop for better debug
-        try:
-            print(f"Processing file: {filename}") # DEBUG
-            df_raw = pd.read_excel(io.BytesIO(content), header=None,dtype=str).dropna(how="all").reset_index(drop=True)
-            cleaned = _clean_single_raw_df(df_raw)
-            if not cleaned.empty: 
-                all_dfs.append(cleaned)
-            else:
-                print(f"Warning: File {filename} resulted in empty data.")
-        except Exception as e:
-            # DEBUG: Print actual error
-            print(f"FAILED processing file {filename}: {e}")
-            traceback.print_exc()
-            pass
+def _parse_raw_file(filename, content):
+    """Read and clean one raw workbook. Module-level so it can run in a worker process."""
+    try:
+        print(f"Processing file: {filename}") # DEBUG
+        df_raw = pd.read_excel(as_file_source(content), header=None,dtype=str).dropna(how="all").reset_index(drop=True)
+        cleaned = _clean_single_raw_df(df_raw)
+        if cleaned.empty:
+            print(f"Warning: File {filename} resulted in empty data.")
+        return cleaned
+    except Exception as e:
+        # DEBUG: Print actual error
+        print(f"FAILED processing file {filename}: {e}")
+        traceback.print_exc()
+        return pd.DataFrame()
+
+def process_raw_data(file_list_bytes, pool=None):
+    # Each workbook parses on its own, so several uploads go to the app's shared
+    # worker pool (upload file objects can't be pickled, their bytes are sent
+    # instead); map() keeps the upload order for the concat
+    if pool is not None and len(file_list_bytes) > 1:
+        names = [filename for filename, _ in file_list_bytes]
+        contents = [as_file_source(content).read() for _, content in file_list_bytes]
+        parsed = list(pool.map(_parse_raw_file, names, contents))
+    else:
+        parsed = [_parse_raw_file(filename, content) for filename, content in file_list_bytes]
+    all_dfs = [df for df in parsed if not df.empty]
 
     if not all_dfs: 
         print("No valid dataframes found in any files.")
@@ -212,7 +223,7 @@ def process_ba_row_data(file_content):
         print("🔹 Starting BA Row Data Processing...")
         
         # 1. READ CSV
-        df = pd.read_csv(io.BytesIO(file_content), low_memory=False)
+        df = pd.read_csv(as_file_source(file_content), low_memory=False)
         print(f"🔹 CSV Loaded. Columns: {list(df.columns[:5])}...")
 
         df.columns = df.columns.str.strip()
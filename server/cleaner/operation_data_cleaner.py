@@ -2,226 +2,280 @@ import pandas as pd
 import numpy as np
 import pdfplumber
 import io
+import logging
 import re
 import xlrd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 import traceback
 from openpyxl import load_workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 from .cleaner_helper import (
     get_mandatory_columns, 
     get_xls_style_data, 
     standardize_dataframe, 
-    format_excel_sheet,
+    add_sheet_styles,
+    format_write_only_sheet,
     clean_columns,
-    clean_address
+    clean_address,
+    as_file_source,
+    xls_contents
 )
 
+logger = logging.getLogger(__name__)
+
 
 # ==========================================
 # 1. APP OPERATION DATA CLEANER
 # ==========================================
 
-
-def process_operation_app_data(file_list_bytes):
-    # 1. Configuration
-    COLUMN_TO_RENAME = {
-        'DATE': 'shift_date', 'TRIP ID': 'trip_id', 'FLT NO.': 'flight_number', 
-        'SAP ID': 'employee_id', 'EMP NAME': 'employee_name', 'EMPLOYEE ADDRESS': 'employee_address', 
-        'PICKUP LOCATION': 'landmark', 'DROP LOCATION': 'office', 'CAB NO': 'cab_last_digit',
-        'PICKUP TIME': 'pickup_time', 'REMARKS': 'mis_remark'
+# Any run of "-", ",", "/" or whitespace collapses to a single space
+ADDRESS_SEPARATORS_RE = re.compile(r"[-,/\s]+")
+
+
+COLUMN_TO_RENAME = {
+    'DATE': 'shift_date', 'TRIP ID': 'trip_id', 'FLT NO.': 'flight_number', 
+    'SAP ID': 'employee_id', 'EMP NAME': 'employee_name', 'EMPLOYEE ADDRESS': 'employee_address', 
+    'PICKUP LOCATION': 'landmark', 'DROP LOCATION': 'office', 'CAB NO': 'cab_last_digit',
+    'PICKUP TIME': 'pickup_time', 'REMARKS': 'mis_remark'
+}
+SKIP_HEADERS = ['CONTACT NO', 'GUARD ROUTE', 'AIRPORT DROP TIME']
+
+_RENAME_ITEMS = tuple(COLUMN_TO_RENAME.items())
+# Headers that are exactly a rename key resolve without a scan; the value is
+# still the first key contained in it, same as the substring match below
+_DIRECT_RENAME = {
+    header: next(val for key, val in _RENAME_ITEMS if key in header) for header in COLUMN_TO_RENAME
+}
+
+
+@lru_cache(maxsize=512)
+def _header_target(raw_header):
+    """Return ('mandatory'|'extra', name) for a source header, or None to skip it."""
+    if any(skip in raw_header for skip in SKIP_HEADERS):
+        return None
+    match = _DIRECT_RENAME.get(raw_header)
+    if match is None:
+        match = next((val for key, val in _RENAME_ITEMS if key in raw_header), None)
+    if match:
+        return ('mandatory', match)
+    return ('extra', raw_header)
+
+
+def _parse_operation_xls(filename, content):
+    """Parse one operation .xls into columnar data plus per-row styling.
+
+    Module-level so it can run in a worker process.
+    """
+    print(f"\n--- Processing File: {filename} ---")
+
+    parsed = {
+        'columns': {},
+        'row_count': 0,
+        'extra_headers': [],
+        'yellow_headers': [],
+        'remark_styles': [],
     }
-    SKIP_HEADERS = ['CONTACT NO', 'GUARD ROUTE', 'AIRPORT DROP TIME']
+    data_columns = parsed['columns']
+    remark_override = []
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Operation_Data"
-    
-    # ... (Styles setup same as before) ...
-    align_center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
+    try:
+        with xls_contents(content) as contents:
+            rb = xlrd.open_workbook(file_contents=contents, formatting_info=True)
+            # Sheets are fully loaded; let go of xlrd's view before the map closes
+            rb.release_resources()
+        rs = rb.sheet_by_index(0)
+        source_headers = [str(cell.value).strip().upper() for cell in rs.row(0)]
+        
+        # Map columns
+        # --- START ADDED LOGIC: IDENTIFY SPECIFIC COLUMN INDICES ---
+        idx_trip = next((i for i, h in enumerate(source_headers) if 'TRIP ID' in h), None)
+        idx_sap = next((i for i, h in enumerate(source_headers) if 'SAP ID' in h), None)
+        idx_addr = next((i for i, h in enumerate(source_headers) if 'EMPLOYEE ADDRESS' in h), None)
+
+        col_to_target_map = {}
+        # --- END ADDED LOGIC ---
+
+        for idx, raw_header in enumerate(source_headers):
+            target = _header_target(raw_header)
+            if target is None: continue
+            target_type, target_name = target
+            if target_type == 'extra' and raw_header not in parsed['extra_headers']:
+                parsed['extra_headers'].append(raw_header)
+            col_to_target_map[idx] = {'type': target_type, 'name': target_name}
+
+        # 4. Process Data Rows
+        # Style decode depends only on the XF record: decode every XF once per
+        # workbook and keep 0/1 lookup arrays for the 3-column red/yellow rule
+        xf_styles = [get_xls_style_data(rb, xf_index) for xf_index in range(len(rb.xf_list))]
+        xf_red = np.fromiter((fg == "FF0000" for _, fg, _ in xf_styles), dtype=np.uint8, count=len(xf_styles))
+        xf_yellow = np.fromiter((bg == "FFFF00" for bg, _, _ in xf_styles), dtype=np.uint8, count=len(xf_styles))
+        check_indices = [idx for idx in [idx_trip, idx_sap, idx_addr] if idx is not None]
+
+        # One list per target column; when two source columns share a target
+        # the right-most one wins, as it did with the old per-row dict
+        target_columns = {}
+        for c_idx, target in col_to_target_map.items():
+            target_columns[target['name']] = c_idx
+        target_names = list(target_columns)
+        target_indices = list(target_columns.values())
+        column_lists = [data_columns.setdefault(name, []) for name in target_names]
+        # A row is kept when it has an employee id or name
+        key_positions = [target_names.index(name) for name in ('employee_id', 'employee_name') if name in target_columns]
+
+        for r_idx in range(1, rs.nrows):
+            # Skip spacer rows from the cell type codes before building any Cell;
+            # only text cells can still be blank once stripped, so those are
+            # re-checked for the rows that pass
+            types = np.asarray(rs.row_types(r_idx), dtype=np.int8)
+            nonempty = int(((types != xlrd.XL_CELL_EMPTY) & (types != xlrd.XL_CELL_BLANK)).sum())
+            if nonempty <= 3:
+                continue
+            # Value and XF index come from the same Cell, no per-cell re-lookup
+            row = rs.row(r_idx)
+            nonempty -= sum(1 for cell in row if cell.ctype == xlrd.XL_CELL_TEXT and not cell.value.strip())
+            if nonempty <= 3: 
+                continue
+
+            values = [row[c_idx].value for c_idx in target_indices]
+            if not any(values[pos] for pos in key_positions):
+                continue
+
+            # 3-column rule: TRIP ID, SAP ID and EMPLOYEE ADDRESS must all be coloured
+            check_xfs = [row[idx].xf_index for idx in check_indices]
+            row_has_red_font = int(xf_red[check_xfs].sum()) == 3
+            row_has_yellow_bg = int(xf_yellow[check_xfs].sum()) == 3
+
+            # Straight into the column lists, no per-row dicts
+            for values_list, val in zip(column_lists, values):
+                values_list.append(val)
+            parsed['row_count'] += 1
+
+            # Business Logic Overrides (Priority: Red > Yellow)
+            if row_has_red_font:
+                remark_override.append("Cancel")
+                parsed['remark_styles'].append("red_remark")
+                logger.debug("[LOGIC] Row %s: Red found -> Marked Cancel", r_idx)
+            elif row_has_yellow_bg:
+                remark_override.append("Alt Veh")
+                parsed['remark_styles'].append("yellow_remark")
+                logger.debug("[LOGIC] Row %s: Yellow found -> Marked Alt Veh", r_idx)
+            else:
+                remark_override.append(None)
+                parsed['remark_styles'].append(None)
+
+            # Remember which cells keep a yellow fill in the output
+            parsed['yellow_headers'].append(
+                {name for name, c_idx in zip(target_names, target_indices) if xf_yellow[row[c_idx].xf_index]}
+            )
+        
+        rb.release_resources()
+    except Exception as e:
+        print(f"[BREAKING ERROR] File {filename}: {e}")
+        traceback.print_exc()
+
+    # Red/yellow rows overwrite the sheet remark (adding the column if the sheet had none)
+    if any(remark is not None for remark in remark_override):
+        remarks = data_columns.setdefault('mis_remark', [None] * parsed['row_count'])
+        data_columns['mis_remark'] = [
+            override if override is not None else remark
+            for override, remark in zip(remark_override, remarks)
+        ]
+
+    return parsed
+
+
+def process_operation_app_data(file_list_bytes, pool=None):
+    # Write-only workbook: rows are streamed once with named styles
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Operation_Data")
+    add_sheet_styles(wb)
 
     try:
         MANDATORY_HEADERS = get_mandatory_columns()
     except:
         MANDATORY_HEADERS = list(COLUMN_TO_RENAME.values())
 
-    for col_idx, header in enumerate(MANDATORY_HEADERS, 1):
-        ws.cell(row=1, column=col_idx, value=header)
-    
-    target_row = 2
-    data_rows = [] 
-    extra_headers_map = {} 
-    next_extra_col_idx = len(MANDATORY_HEADERS) + 1
-
     # 3. Processing Loop
-    for filename, content in file_list_bytes:
-        if not filename.lower().endswith('.xls'): continue
-        print(f"\n--- Processing File: {filename} ---")
-
-        try:
-            rb = xlrd.open_workbook(file_contents=content, formatting_info=True)
-            rs = rb.sheet_by_index(0)
-            source_headers = [str(rs.cell_value(0, c)).strip().upper() for c in range(rs.ncols)]
-            
-            # Map columns
-            # --- START ADDED LOGIC: IDENTIFY SPECIFIC COLUMN INDICES ---
-            idx_trip = next((i for i, h in enumerate(source_headers) if 'TRIP ID' in h), None)
-            idx_sap = next((i for i, h in enumerate(source_headers) if 'SAP ID' in h), None)
-            idx_addr = next((i for i, h in enumerate(source_headers) if 'EMPLOYEE ADDRESS' in h), None)
-
-            col_to_target_map = {}
-            # --- END ADDED LOGIC ---
-
-            for idx, raw_header in enumerate(source_headers):
-                if any(skip in raw_header for skip in SKIP_HEADERS): continue
-                match = next((val for key, val in COLUMN_TO_RENAME.items() if key in raw_header), None)
-                if match:
-                    col_to_target_map[idx] = {'type': 'mandatory', 'name': match}
-                else:
-                    if raw_header not in extra_headers_map:
-                        extra_headers_map[raw_header] = next_extra_col_idx
-                        ws.cell(row=1, column=next_extra_col_idx, value=raw_header)
-                        next_extra_col_idx += 1
-                    col_to_target_map[idx] = {'type': 'extra', 'name': raw_header}
-
-            # 4. Process Data Rows
-            for r_idx in range(1, rs.nrows):
-                row_vals = [str(rs.cell_value(r_idx, c)).strip() for c in range(rs.ncols)]
-                if sum(1 for v in row_vals if v != "") <= 3: 
-                    continue
-
-                row_data_map = {} 
-                db_row_dict = {}
-                
-                # Logic Flags for Style Detection across the entire row
-                row_has_yellow_bg = False
-                row_has_red_font = False
-
-                # --- START ADDED LOGIC: 3-COLUMN COUNTERS ---
-                red_count = 0
-                yellow_count = 0
-                check_indices = [idx for idx in [idx_trip, idx_sap, idx_addr] if idx is not None]
-                # --- END ADDED LOGIC ---
-
-                # Pass 1: Extract data and scan row for color indicators
-                for c_idx in range(rs.ncols):
-                    bg, fg, is_bold = get_xls_style_data(rb, rs.cell_xf_index(r_idx, c_idx), r_idx, c_idx)
-                    
-                    # --- START ADDED LOGIC: UPDATE COUNTERS BASED ON 3 SPECIFIC COLUMNS ---
-                    if c_idx in check_indices:
-                        if fg == "FF0000": red_count += 1
-                        if bg == "FFFF00": yellow_count += 1
-                    # --- END ADDED LOGIC ---
-                    
-                    if fg == "FF0000": row_has_red_font = True
-                    if bg == "FFFF00": row_has_yellow_bg = True
-                    
-                    if c_idx in col_to_target_map:
-                        target_header = col_to_target_map[c_idx]['name']
-                        val = rs.cell_value(r_idx, c_idx)
-                        row_data_map[target_header] = {'val': val, 'bg': bg, 'fg': fg, 'bold': is_bold}
-                        db_row_dict[target_header] = val
-
-                # --- START ADDED LOGIC: RE-EVALUATE FLAGS BASED ON 3-COLUMN RULE ---
-                row_has_red_font = (red_count == 3)
-                row_has_yellow_bg = (yellow_count == 3)
-                # --- END ADDED LOGIC ---
-
-                # Pass 2: Apply Business Logic Overrides (Priority: Red > Yellow)
-                if row_has_red_font:
-                    db_row_dict['mis_remark'] = "Cancel"
-                    print(f"[LOGIC] Row {r_idx}: Red found -> Marked Cancel")
-                elif row_has_yellow_bg:
-                    db_row_dict['mis_remark'] = "Alt Veh"
-                    print(f"[LOGIC] Row {r_idx}: Yellow found -> Marked Alt Veh")
-
-                # Pass 3: Write to Excel Output
-                ws.row_dimensions[target_row].height = 25
-                for c_out, m_header in enumerate(MANDATORY_HEADERS, 1):
-                    cell = ws.cell(row=target_row, column=c_out)
-                    
-                    # Get value from dict (contains overrides like 'Cancel')
-                    cell.value = db_row_dict.get(m_header, "")
-                    
-                    # Styling for the mis_remark column based on triggers
-                    if m_header == 'mis_remark':
-                        if row_has_red_font:
-                            cell.font = Font(color="FF0000", bold=True)
-                        elif row_has_yellow_bg:
-                            cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type='solid')
-                            cell.font = Font(bold=True)
-                    elif m_header in row_data_map:
-                        # Carry over original formatting for other columns
-                        d = row_data_map[m_header]
-                        if d['bg']:
-                            cell.fill = PatternFill(start_color=d['bg'], end_color=d['bg'], fill_type='solid')
-                        cell.font = Font(bold=d['bold'], color=d['fg'] if d['fg'] else None)
-                    
-                    cell.alignment = align_center
-                    cell.border = border
-
-                # Extra check for dynamic extra columns
-                for extra_name, extra_col_idx in extra_headers_map.items():
-                    cell = ws.cell(row=target_row, column=extra_col_idx)
-                    if extra_name in row_data_map:
-                        cell.value = row_data_map[extra_name]['val']
-                        cell.alignment = align_center
-                        cell.border = border
-
-                # Append row to DB list
-                if db_row_dict.get('employee_id') or db_row_dict.get('employee_name'):
-                    data_rows.append(db_row_dict)
-                    target_row += 1
-            
-            rb.release_resources()
-        except Exception as e:
-            print(f"[BREAKING ERROR] File {filename}: {e}")
-            traceback.print_exc()
+    # Files are independent, so several uploads are parsed on the app's shared
+    # worker pool (as bytes; upload file objects can't be pickled);
+    # map() keeps the upload order for the merge below
+    file_list_bytes = [(name, content) for name, content in file_list_bytes if name.lower().endswith('.xls')]
+    if pool is not None and len(file_list_bytes) > 1:
+        names = [name for name, _ in file_list_bytes]
+        contents = [as_file_source(content).read() for _, content in file_list_bytes]
+        parsed_files = list(pool.map(_parse_operation_xls, names, contents))
+    else:
+        parsed_files = [_parse_operation_xls(filename, content) for filename, content in file_list_bytes]
+
+    # Columnar accumulation: one list per output column, padded with None
+    data_columns = {}
+    data_row_count = 0
+    # Per-row styling kept for the single write at the end
+    row_yellow_headers = []
+    row_remark_styles = []
+    extra_headers = []
+
+    for parsed in parsed_files:
+        for raw_header in parsed['extra_headers']:
+            if raw_header not in extra_headers:
+                extra_headers.append(raw_header)
+        file_rows = parsed['row_count']
+        for name in parsed['columns']:
+            if name not in data_columns:
+                data_columns[name] = [None] * data_row_count
+        for name, values in data_columns.items():
+            values.extend(parsed['columns'].get(name) or [None] * file_rows)
+        data_row_count += file_rows
+        row_yellow_headers.extend(parsed['yellow_headers'])
+        row_remark_styles.extend(parsed['remark_styles'])
 
     # --- DATAFRAME POST-PROCESSING ---
-    df_db = pd.DataFrame(data_rows)
+    df_db = pd.DataFrame(data_columns)
+    output_headers = MANDATORY_HEADERS + extra_headers
+    FINAL_HEADERS = [h.upper() for h in output_headers]
+    output_columns = [[] for _ in output_headers]
     if not df_db.empty:
-        # 1. Helper: Convert Serial Date to DD-MM-YYYY
-        def convert_date(d):
-            try:
-                # Handle Excel Serial (e.g., 46023)
-                f_val = float(d)
-                # Excel's base date is 1899-12-30
-                dt = datetime(1899, 12, 30) + timedelta(days=f_val)
-                return dt.strftime('%d-%m-%Y')
-            except:
-                return str(d)
-
-        # 2. Helper: Convert Serial Time to HH:MM
-        def convert_time(t):
-            try:
-                f_val = float(t) % 1 # MOD 1 logic
-                seconds = int(round(f_val * 86400))
-                return (datetime.min + timedelta(seconds=seconds)).strftime('%H:%M')
-            except:
-                return str(t)
-
+        # 1. Convert Excel serial dates (base 1899-12-30) to DD-MM-YYYY
+        # 2. Combine with serial times (MOD 1 of a day) as Timestamps directly,
+        #    without formatting and re-parsing strings
         print("[DEBUG] Converting Date to DD-MM-YYYY and calculating Shift Time...")
-        df_db['shift_date'] = df_db['shift_date'].apply(convert_date)
-        df_db['pickup_time'] = df_db['pickup_time'].apply(convert_time)
+        excel_epoch = pd.Timestamp("1899-12-30")
+
+        date_serial = pd.to_numeric(df_db['shift_date'], errors='coerce')
+        shift_day = excel_epoch + pd.to_timedelta(np.floor(date_serial), unit='D')
+        df_db['shift_date'] = shift_day.dt.strftime('%d-%m-%Y').fillna(df_db['shift_date'].astype(str))
+
+        # Seconds are rounded, then truncated to HH:MM within the day
+        time_minutes = (pd.to_numeric(df_db['pickup_time'], errors='coerce') % 1 * 86400).round() % 86400 // 60
+        temp_pickup_dt = shift_day + pd.to_timedelta(time_minutes, unit='m')
+
+        # Text (non-serial) dates or times still go through the string parser
+        text_rows = temp_pickup_dt.isna()
+        if text_rows.any():
+            pickup_text = (
+                (excel_epoch + pd.to_timedelta(time_minutes, unit='m'))
+                .dt.strftime('%H:%M')
+                .fillna(df_db['pickup_time'].astype(str))
+            )
+            temp_pickup_dt[text_rows] = pd.to_datetime(
+                df_db['shift_date'][text_rows] + " " + pickup_text[text_rows], dayfirst=True, errors='coerce'
+            )
 
         # 3. Logic: SHIFT TIME = PICKUP TIME + 2 HOURS
-        # Convert DD-MM-YYYY back to datetime for calculation
-        temp_pickup_dt = pd.to_datetime(df_db['shift_date'] + " " + df_db['pickup_time'], dayfirst=True, errors='coerce')
-        
-        # Add 2 Hours
         temp_shift_dt = temp_pickup_dt + pd.Timedelta(hours=2)
-        shift_date_dt = pd.to_datetime(df_db["shift_date"], dayfirst=True).dt.date
 
         # 4. Populate Final Columns
         df_db['shift_time'] = temp_shift_dt.dt.strftime('%H:%M')
-        fixed_drop_dt = temp_shift_dt.where(
-            temp_shift_dt.dt.date == shift_date_dt,
-            temp_shift_dt - pd.Timedelta(days=1)
+        # Day rollover compared as datetime64[D], no datetime.date objects
+        shift_values = temp_shift_dt.to_numpy(dtype="datetime64[ns]")
+        same_day = shift_values.astype("datetime64[D]") == temp_pickup_dt.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        fixed_drop_dt = pd.Series(
+            np.where(same_day, shift_values, shift_values - np.timedelta64(1, "D")), index=temp_shift_dt.index
         )
         df_db["drop_time"] = fixed_drop_dt.dt.strftime("%d-%m-%Y %H:%M")
 
@@ -230,48 +284,73 @@ def process_operation_app_data(file_list_bytes):
         df_db["pickup_time"] = pickup_dt.dt.strftime("%d-%m-%Y %H:%M")
 
 
-        # 5. Fill Excel Sheet cells with calculated data
-        # We rewrite the Excel logic here to ensure the calculated fields are in the file
-        for r_idx, row_data in enumerate(df_db.to_dict('records'), 2):
-            for c_idx, header in enumerate(MANDATORY_HEADERS, 1):
-                cell = ws.cell(row=r_idx, column=c_idx, value=row_data.get(header, ""))
-                cell.alignment = align_center
-                cell.border = border
-
         
         # --- 3. THE CLEANING BLOCK (FIXED) ---
         df_db.columns = df_db.columns.str.strip().str.upper()
 
         numeric_cols = ["TRIP_ID", "EMPLOYEE_ID", "CAB_LAST_DIGIT"]
+        sheet_ids = {}
         for col in numeric_cols:
             if col in df_db.columns:
-                df_db[col] = pd.to_numeric(df_db[col], errors="coerce")
+                source = df_db[col]
+                df_db[col] = pd.to_numeric(source, errors="coerce")
+                # Whole-number IDs stay nullable integers instead of float64
+                if (df_db[col].dropna() % 1 == 0).all():
+                    df_db[col] = df_db[col].astype("Int64")
+                # The sheet keeps text cells as typed ("T1", "0042"); only the DB frame is numeric
+                source_text = source.astype(str).str.strip().str.upper()
+                is_text = source.map(lambda v: isinstance(v, str)) & source_text.ne("")
+                sheet_ids[col] = df_db[col].astype(object).where(df_db[col].notna(), "").where(~is_text, source_text)
 
         if "EMPLOYEE_ADDRESS" in df_db.columns:
             df_db["EMPLOYEE_ADDRESS"] = (
                 df_db["EMPLOYEE_ADDRESS"]
-                .astype(str)
-                .str.replace(r"[- , /]", " ", regex=True) # Combined regex for speed
-                .str.replace(r"\s+", " ", regex=True)
+                .astype("string")
+                .str.replace(ADDRESS_SEPARATORS_RE, " ", regex=True)
                 .str.strip()
                 .str.upper()
             )
 
-        # Final conversion of all text to Upper
-        text_cols = df_db.select_dtypes(include="object").columns
-        df_db[text_cols] = df_db[text_cols].apply(lambda col: col.str.upper())
-        df_db = df_db.fillna("").astype(str)
-
-        # --- 4. WRITE CLEANED DATA TO EXCEL ---
-        # Update headers to match uppercase
-        FINAL_HEADERS = [h.upper() for h in MANDATORY_HEADERS]
-        for col_idx, header in enumerate(FINAL_HEADERS, 1):
-            ws.cell(row=1, column=col_idx, value=header)
-
-
-        df_db = df_db.fillna("").astype(str)
+        # Final conversion of all text to Upper (kept in the compact string dtype)
+        text_cols = df_db.select_dtypes(include=["object", "string"]).columns
+        df_db[text_cols] = df_db[text_cols].apply(lambda col: col.str.upper()).astype("string")
+        # Only text needs blanks; ID columns stay nullable Int64, where "" is invalid
+        df_db[text_cols] = df_db[text_cols].fillna("")
+
+        # 5. Collect the cleaned sheet columns (written once below)
+        empty_column = np.full(len(df_db), "", dtype=object)
+        output_columns = [
+            sheet_ids[h].to_numpy() if h in sheet_ids
+            else df_db[h].astype(object).where(df_db[h].notna(), "").to_numpy() if h in df_db.columns
+            else empty_column
+            for h in FINAL_HEADERS
+        ]
+
+    # --- 4. WRITE CLEANED DATA TO EXCEL (single streaming pass) ---
+    format_write_only_sheet(ws, FINAL_HEADERS, output_columns)
+
+    header_row = []
+    for header in FINAL_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.style = "sheet_header"
+        header_row.append(cell)
+    ws.append(header_row)
+
+    for r_idx, values in enumerate(zip(*output_columns)):
+        yellow_headers = row_yellow_headers[r_idx]
+        remark_style = row_remark_styles[r_idx]
+        row_cells = []
+        for header, value in zip(output_headers, values):
+            cell = WriteOnlyCell(ws, value=value)
+            if header == 'mis_remark' and remark_style:
+                cell.style = remark_style
+            elif header in yellow_headers and header != 'mis_remark':
+                cell.style = "sheet_body_yellow"
+            else:
+                cell.style = "sheet_body"
+            row_cells.append(cell)
+        ws.append(row_cells)
 
-    format_excel_sheet(ws)
     output = io.BytesIO()
     wb.save(output)
     output.seek(0)
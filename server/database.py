@@ -1,10 +1,11 @@
+import os
 import json
+import logging
 from typing import Generator
+from sqlalchemy import Connection, make_url, text
 from sqlmodel import SQLModel, create_engine, Session
 
-import os
-import json
-from sqlmodel import SQLModel, create_engine, Session
+logger = logging.getLogger(__name__)
 
 # --- 1. SETUP DATABASE URL ---
 
@@ -24,31 +25,101 @@ if not DATABASE_URL:
                 f"@{secrets['DB_HOST']}:{secrets.get('DB_PORT', 5432)}/{secrets['DB_NAME']}"
             )
     except FileNotFoundError:
-        print("⚠️  WARNING: No secrets.json found and no DATABASE_URL set.")
+        logger.warning("⚠️  No secrets.json found and no DATABASE_URL set.")
         DATABASE_URL = "sqlite:///./test.db" # Fallback to a temporary local file
 
 # --- 2. CREATE ENGINE ---
 # Supabase/Postgres requires SSL. SQLite (fallback) does not.
+# On Postgres the pool is sized for concurrent requests: LIFO keeps a small
+# warm set of TLS connections, recycle/keepalives avoid stale-socket reconnects.
+# psycopg2's fast-execution helpers batch UPDATE/DELETE executemany as well
+# (INSERTs already use multi-row VALUES).
 connect_args = {}
+engine_args = {}
 if "postgresql" in DATABASE_URL:
-    connect_args = {"sslmode": "require"}
+    connect_args = {"sslmode": "require", "keepalives": 1, "keepalives_idle": 30}
+    # DB_POOL_SIZE / DB_MAX_OVERFLOW let several workers share a PgBouncer
+    # (transaction mode) or Supabase pooler without exceeding its client limit
+    engine_args = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 20)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_use_lifo": True,
+    }
+    if make_url(DATABASE_URL).get_driver_name() == "psycopg2":
+        engine_args.update(executemany_mode="values_plus_batch", executemany_batch_page_size=500)
 
-engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True, connect_args=connect_args)
+# Bulk inserts are sent as multi-row VALUES pages of 1000 rows
+engine = create_engine(
+    DATABASE_URL, echo=False, pool_pre_ping=True, insertmanyvalues_page_size=1000,
+    connect_args=connect_args, **engine_args
+)
 
 
 
 # --- 3. HELPER FUNCTIONS ---
 
+# GPS Corner filters and the Locality Manager address search are substring
+# matches (LIKE/ILIKE '%...%'), which a btree can't serve; pg_trgm GIN indexes
+# let Postgres use an index scan for them
+TRIGRAM_INDEXES = {
+    "ix_trip_data_cab_reg_no_trgm": ("trip_data", "cab_reg_no"),
+    "ix_trip_data_shift_date_trgm": ("trip_data", "shift_date"),
+    "ix_trip_data_clubbing_status_trgm": ("trip_data", "clubbing_status"),
+    "ix_t3_address_locality_address_trgm": ("t3_address_locality", "address"),
+}
+
+# Locality Manager: pending rows (locality IS NULL) are counted and paged on
+# every view. (The plain locality index is declared on the model.)
+LOCALITY_INDEXES = {
+    "ix_t3_address_locality_pending": "t3_address_locality (id) WHERE locality IS NULL",
+}
+
+def create_search_indexes():
+    """
+    Postgres only. Run after create_all; IF NOT EXISTS makes it safe on every startup.
+    The plain indexes and the pg_trgm ones go in separate transactions, so a
+    database where the extension can't be created still gets the former.
+    """
+    try:
+        with engine.begin() as conn:
+            for index_name, target in LOCALITY_INDEXES.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {target}"))
+    except Exception as e:
+        logger.warning("⚠️  Could not create locality indexes: %s", e)
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for index_name, (table, column) in TRIGRAM_INDEXES.items():
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} "
+                    f"ON {table} USING gin ({column} gin_trgm_ops)"
+                ))
+    except Exception as e:
+        logger.warning("⚠️  Could not create trigram indexes: %s", e)
+
 def create_db_and_tables():
     """
     Creates tables based on imported SQLModel classes.
     Call this from main.py lifespan/startup.
     """
     SQLModel.metadata.create_all(engine)
+    if engine.dialect.name == "postgresql":
+        create_search_indexes()
 
 def get_session() -> Generator[Session, None, None]:
     """
     Dependency to yield a database session per request.
     """
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def get_readonly_conn() -> Generator[Connection, None, None]:
+    """
+    Dependency for read-only routes: a plain Core connection, no ORM
+    session or identity map. Rows come back via .mappings().
+    """
+    with engine.connect() as conn:
+        yield conn
@@ -1,4 +1,11 @@
 import os
+import re
+import queue
+import asyncio
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from contextlib import asynccontextmanager
 from sqlalchemy import text
@@ -6,19 +13,21 @@ from sqlmodel import Session
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
 
 # Internal Imports
 from .database import create_db_and_tables, engine
 from .admin import setup_admin
+from .utils.global_helpers import warm_templates
 from .api import cleaner_api, gps_api, locality_api, page_route_api, download_api
 
 # --- 1. CONFIGURATION & PATHS ---
 BASE_DIR = Path(__file__).resolve().parent
 CLIENT_DIR = BASE_DIR.parent / "client"
 COMPONENTS_DIR = CLIENT_DIR / "Components"
+on_render = os.environ.get("RENDER") is not None
 
 DIRS = {
     "home": CLIENT_DIR / "HomePage",
@@ -30,9 +39,25 @@ DIRS = {
     "components": CLIENT_DIR / "Components"
 }
 
+# App loggers ("server.*") only put records on a queue; the listener thread
+# does the stderr writes, so request threads never wait on the stream
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(
+    log_queue, logging.StreamHandler(), respect_handler_level=True
+)
+app_logger = logging.getLogger("server")
+app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+app_logger.setLevel(logging.INFO)
+app_logger.propagate = False
+logger = logging.getLogger(__name__)
+
+# Multi-file cleaner uploads are parsed in this many worker processes. The pool
+# is created once per app; forkserver workers start from a clean process
+# instead of forking the server along with its listener and pool threads
+CLEANER_WORKERS = int(os.environ.get("CLEANER_WORKERS", min(4, os.cpu_count() or 1)))
+
 # --- 2. LIFESPAN (Startup & Sequence Fix) ---
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+def prepare_database():
     create_db_and_tables()
     
     # Auto-fix sequence for Address Table (Prevents "Key (id)=(x) already exists" error)
@@ -40,11 +65,26 @@ async def lifespan(app: FastAPI):
         with Session(engine) as session:
             session.exec(text("SELECT setval(pg_get_serial_sequence('t3_address_locality', 'id'), coalesce(max(id),0) + 1, false) FROM t3_address_locality;"))
             session.commit()
-            print("✅ Address Table Sequence Sync Completed.")
+            logger.info("✅ Address Table Sequence Sync Completed.")
     except Exception:
         pass 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener.start()
+    app.state.cleaner_pool = ProcessPoolExecutor(
+        max_workers=CLEANER_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+    )
+    # Both are blocking; in worker threads the DB round trips and template
+    # compilation overlap instead of running back to back on the event loop
+    await asyncio.gather(
+        run_in_threadpool(prepare_database),
+        run_in_threadpool(warm_templates),
+    )
         
     yield
+    app.state.cleaner_pool.shutdown(cancel_futures=True)
+    log_listener.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -56,26 +96,53 @@ app.include_router(page_route_api.router)
 app.include_router(download_api.router)
 
 
-# --- 4. STATIC FILES & TEMPLATES ---
-app.mount("/home-static", StaticFiles(directory=DIRS["home"]), name="home_static")
-app.mount("/login-static", StaticFiles(directory=DIRS["login"]), name="login_static")
-app.mount("/cleaner-static", StaticFiles(directory=DIRS["cleaner"]), name="cleaner_static")
-app.mount("/gps-static", StaticFiles(directory=DIRS["gps"]), name="gps_static")
-app.mount("/locality-static", StaticFiles(directory=DIRS["locality"]), name="locality_static")
-app.mount("/operation-manager-static", StaticFiles(directory=DIRS["operation-manager"]), name="operation-manager_static")
-app.mount("/components-static", StaticFiles(directory=DIRS["components"]), name="components_static")
-
-templates = {
-    "home": Jinja2Templates(directory=DIRS["home"]),
-    "login": Jinja2Templates(directory=DIRS["login"]),
-    "cleaner": Jinja2Templates(directory=DIRS["cleaner"]),
-    "gps": Jinja2Templates(directory=DIRS["gps"]),
-    "locality": Jinja2Templates(directory=DIRS["locality"]),
-    "operation-manager": Jinja2Templates(directory=DIRS["operation-manager"]),
-    "components": Jinja2Templates(directory=DIRS["components"]),
-}
-
-
+# --- 4. STATIC FILES ---
+# Page templates share one Jinja environment: utils/global_helpers.py
+HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with Cache-Control on top of the ETag/Last-Modified it already sends.
+    Fingerprinted files never change; plain CSS/JS get an hour; anything else
+    (e.g. files in DataCleaner/generated) is revalidated every time.
+
+    On Render, CSS/JS only change with a deploy, so their path lookup + stat is
+    kept after the first hit and later requests skip the threadpool round trip.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.asset_lookups = {}
+
+    async def get_response(self, path, scope):
+        hit = self.asset_lookups.get(path)
+        if hit is not None and scope["method"] in ("GET", "HEAD"):
+            return self.file_response(*hit, scope)
+        return await super().get_response(path, scope)
+
+    def lookup_path(self, path):
+        full_path, stat_result = super().lookup_path(path)
+        if on_render and stat_result is not None and full_path.endswith((".css", ".js")):
+            self.asset_lookups[path] = (full_path, stat_result)
+        return full_path, stat_result
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = str(full_path)
+        if HASHED_ASSET_RE.search(path):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        elif path.endswith((".css", ".js")):
+            response.headers["Cache-Control"] = "public, max-age=3600"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+app.mount("/home-static", CachedStaticFiles(directory=DIRS["home"]), name="home_static")
+app.mount("/login-static", CachedStaticFiles(directory=DIRS["login"]), name="login_static")
+app.mount("/cleaner-static", CachedStaticFiles(directory=DIRS["cleaner"]), name="cleaner_static")
+app.mount("/gps-static", CachedStaticFiles(directory=DIRS["gps"]), name="gps_static")
+app.mount("/locality-static", CachedStaticFiles(directory=DIRS["locality"]), name="locality_static")
+app.mount("/operation-manager-static", CachedStaticFiles(directory=DIRS["operation-manager"]), name="operation-manager_static")
+app.mount("/components-static", CachedStaticFiles(directory=DIRS["components"]), name="components_static")
 
 
 
@@ -89,10 +156,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST"],
     allow_headers=["Authorization", "Content-Type"],
+    # Browsers may reuse a preflight result for a day instead of re-sending OPTIONS
+    max_age=86400,
 )
 
 
-on_render = os.environ.get("RENDER") is not None
 app.add_middleware(
     SessionMiddleware,
     secret_key="super_secret_static_key",
@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel, ConfigDict
 
 # Base model with dynamic column support
@@ -204,7 +204,6 @@ class OperationData(DynamicSQLModel, table=True):
     trip_date: Optional[str] = None
     mis_remark: Optional[str] = None
     data_source: Optional[str] = None
-    unique_id: Optional[str] = None
     
     # Special columns
     una: Optional[str] = None
@@ -284,7 +283,7 @@ class T3AddressLocality(DynamicSQLModel, table=True):
     
     id: Optional[int] = Field(default=None, primary_key=True)
     address: str = Field(index=True, unique=True)
-    locality: Optional[str] = Field(default=None, foreign_key="t3_locality_zone.locality")
+    locality: Optional[str] = Field(default=None, foreign_key="t3_locality_zone.locality", index=True)
     zone: Optional[str] = Field(default=None)
     km: Optional[str] = Field(default=None)
     
@@ -330,6 +329,38 @@ class NewMasterSchema(BaseModel):
     locality_name: str
     zone_name: str
 
+class CleanDataResult(BaseModel):
+    status: str
+    file_url: str
+    rows_processed: Union[int, str]  # "Formatting Only" when the operation cleaner has no rows
+    db_rows_added: int
+
+class GPSTripRow(BaseModel):
+    """The TripData columns the GPS Corner cards show or edit"""
+    unique_id: str
+    trip_id: Optional[str] = None
+    trip_date: Optional[str] = None
+    cab_reg_no: Optional[str] = None
+    trip_direction: Optional[str] = None
+    route_status: Optional[str] = None
+    clubbing_status: Optional[str] = None
+    employee_id: Optional[str] = None
+    employee_name: Optional[str] = None
+    address: Optional[str] = None
+    office: Optional[str] = None
+    journey_start_location: Optional[str] = None
+    journey_end_location: Optional[str] = None
+    gps_time: Optional[str] = None
+    gps_remark: Optional[str] = None
+
+class GPSUpdateResult(BaseModel):
+    status: str
+    data: GPSTripRow
+
+class GPSBulkUpdateResult(BaseModel):
+    status: str
+    updated: int
+
 # --- Dynamic Column Management ---
 class DynamicColumnSchema(BaseModel):
     model_name: str
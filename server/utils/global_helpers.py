@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+from fastapi import Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+CLIENT_DIR = BASE_DIR / "client"
+
+TEMPLATE_DIRS = [
+    CLIENT_DIR / "HomePage",
+    CLIENT_DIR / "LoginPage",
+    CLIENT_DIR / "DataCleaner",
+    CLIENT_DIR / "GPSCorner",
+    CLIENT_DIR / "LocalityCorner",
+    CLIENT_DIR / "OperationManager",
+]
+
+# --- SHARED JINJA ENVIRONMENT ---
+# One environment for every page, with compiled templates kept on disk so a
+# restarted worker doesn't recompile them. Render only allows writes under /tmp.
+on_render = os.environ.get("RENDER") is not None
+JINJA_CACHE_DIR = Path("/tmp/jinja") if on_render else BASE_DIR / ".jinja_cache"
+JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+jinja_env = Environment(
+    loader=ChoiceLoader([FileSystemLoader(str(d)) for d in TEMPLATE_DIRS]),
+    bytecode_cache=FileSystemBytecodeCache(str(JINJA_CACHE_DIR)),
+    autoescape=True,
+    auto_reload=not on_render,
+    cache_size=400,
+)
+
+templates = Jinja2Templates(env=jinja_env)
+
+
+def warm_templates():
+    """Load every page template once so the first request doesn't pay for compiling it."""
+    for name in jinja_env.list_templates(filter_func=lambda n: n.endswith(".html")):
+        jinja_env.get_template(name)
+
+
+# --- REDIRECTS ---
+# Header dicts built once; Response copies them into its own header list,
+# skipping RedirectResponse's per-call URL quoting
+LOGIN_REDIRECT_HEADERS = {"location": "/login"}
+HOME_REDIRECT_HEADERS = {"location": "/"}
+
+def redirect_to_login() -> Response:
+    return Response(status_code=303, headers=LOGIN_REDIRECT_HEADERS)
+
+def redirect_to_home(status_code: int = 303) -> Response:
+    return Response(status_code=status_code, headers=HOME_REDIRECT_HEADERS)